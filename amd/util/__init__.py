@@ -0,0 +1,45 @@
+"""A Python utility library.
+
+Submodules are imported on first access, so "import amd.util" stays cheap and
+only the dependencies of the submodules that are used get imported.
+"""
+
+import importlib
+from typing import Any, List
+
+SUBMODULES = (
+    "datetime",
+    "dict",
+    "doc",
+    "error",
+    "flask",
+    "json",
+    "jsonschema",
+    "log",
+    "object",
+    "path",
+    "quart",
+    "string",
+)
+"""The names of the submodules which can be accessed as attributes."""
+
+
+def __dir__() -> List[str]:
+    """List the module attributes, including submodules that aren't imported.
+
+    :return: The attribute names.
+    """
+    return sorted(set(globals()).union(SUBMODULES))
+
+
+def __getattr__(name: str) -> Any:
+    """Import a submodule on first access. See PEP 562.
+
+    :param name: The name of the submodule.
+
+    :return: The submodule.
+    """
+    if name not in SUBMODULES:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    return importlib.import_module("." + name, __name__)
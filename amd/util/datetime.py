@@ -1,50 +1,157 @@
 """Functions for working with datetimes."""
 
-from datetime import datetime
-from typing import Any, Iterable
+import math
+import sys
+from bisect import bisect_right
+from collections.abc import Iterator
+from datetime import date, datetime, timedelta, timezone
+from datetime import tzinfo as _tzinfo
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import pytz
 from pytz import _FixedOffset
 
+_EPOCH = datetime(1970, 1, 1)
+"""The naive POSIX epoch."""
 
-def make_aware(obj: Any, tzinfo: _FixedOffset = pytz.UTC) -> Any:
+_ATOMIC_TYPES = frozenset(
+    (bool, bytearray, bytes, date, float, int, memoryview, str, type(None))
+)
+"""Types which never contain datetimes."""
+
+
+def make_aware(
+    obj: Any, tzinfo: _FixedOffset = pytz.UTC, inplace: bool = False
+) -> Any:
     """Recusrively make all datetime objects timezone-aware.
 
+    Objects without naive datetimes are returned as is. Otherwise only the
+    containers along the path to a naive datetime are copied, and dicts,
+    lists, tuples, named tuples, sets, and frozensets keep their types. Other
+    collections, such as deques, ranges, and dict views, become lists if they
+    contain naive datetimes. NumPy arrays are returned as is. Iterators, such
+    as generators, are rejected rather than consumed.
+
     :param obj: A datetime or an object that may contain datetimes.
     :param tzinfo: The timezone to use for localization.
+    :param inplace: Whether to mutate dicts and lists instead of copying them.
+
+    :raises TypeError: If the object contains an iterator.
 
     :return: A timezone-aware datetime or an object containing timezone-aware
              datetimes.
     """
-    if isinstance(obj, dict):
-        return {k: make_aware(v, tzinfo=tzinfo) for k, v in obj.items()}
 
-    if isinstance(obj, Iterable) and not isinstance(obj, str):
-        return [make_aware(i, tzinfo=tzinfo) for i in obj]
+    def localize(dtm: datetime) -> datetime:
+        return tzinfo.localize(dtm) if is_naive(dtm) else dtm
 
-    if isinstance(obj, datetime) and is_naive(obj):
-        obj = tzinfo.localize(obj)
+    return _replace_datetimes(obj, localize, inplace)
 
-    return obj
+
+def make_aware_many(
+    datetimes: Union[Sequence[datetime], "numpy.ndarray"],
+    tzinfo: _FixedOffset = pytz.UTC,
+) -> Union[List[datetime], "numpy.ndarray"]:
+    """Make a batch of datetimes timezone-aware.
+
+    NumPy datetime64 arrays cannot hold a timezone, so their values are treated
+    as wall times in the timezone and converted to UTC in one vectorized
+    operation. Wall times which are ambiguous or don't exist because of a
+    transition are resolved with localize, so the results match localize.
+
+    :param datetimes: A sequence of datetimes or a NumPy datetime64 array.
+    :param tzinfo: The timezone to use for localization.
+
+    :return: A list of timezone-aware datetimes, or a datetime64 array of UTC
+             times.
+    """
+    if _is_datetime64_array(datetimes):
+        return datetimes - _datetime64_offsets(datetimes, tzinfo, local=True)
+
+    if hasattr(tzinfo, "_utc_transition_times"):
+        # Look up the pytz timezone for each wall time with a binary search
+        # instead of calling localize, which tries several candidates.
+        transitions, tzinfos, starts, ends = _pytz_transitions(tzinfo)
+        localize = tzinfo.localize
+        result = []
+        for i in datetimes:
+            if not is_naive(i):
+                result.append(i)
+                continue
+            window = bisect_right(starts, i) - 1
+            if window >= 0 and i < ends[window]:
+                # The wall time is repeated or skipped by a transition.
+                result.append(localize(i))
+            else:
+                result.append(
+                    i.replace(tzinfo=tzinfos[bisect_right(transitions, i) - 1])
+                )
+        return result
+
+    if tzinfo.utcoffset(None) is None and hasattr(tzinfo, "localize"):
+        localize = tzinfo.localize
+        return [localize(i) if is_naive(i) else i for i in datetimes]
+
+    # Fixed offsets and non-pytz timezones are attached with replace.
+    return [i.replace(tzinfo=tzinfo) if is_naive(i) else i for i in datetimes]
 
 
-def make_naive(obj: Any) -> Any:
+def make_naive(obj: Any, inplace: bool = False) -> Any:
     """Recusrively make all datetime objects naive.
 
+    Copies only what changes, like make_aware.
+
     :param obj: A datetime or an object that may contain datetimes.
+    :param inplace: Whether to mutate dicts and lists instead of copying them.
+
+    :raises TypeError: If the object contains an iterator.
 
     :return: A naive datetime or an object containing naive datetimes.
     """
-    if isinstance(obj, dict):
-        return {k: make_naive(v) for k, v in obj.items()}
 
-    if isinstance(obj, Iterable) and not isinstance(obj, str):
-        return [make_naive(i) for i in obj]
+    def remove_tzinfo(dtm: datetime) -> datetime:
+        return dtm.replace(tzinfo=None) if is_aware(dtm) else dtm
 
-    if isinstance(obj, datetime) and is_aware(obj):
-        obj = obj.replace(tzinfo=None)
+    return _replace_datetimes(obj, remove_tzinfo, inplace)
 
-    return obj
+
+def make_naive_many(
+    datetimes: Union[Sequence[datetime], "numpy.ndarray"],
+    tzinfo: Optional[_tzinfo] = None,
+) -> Union[List[datetime], "numpy.ndarray"]:
+    """Make a batch of datetimes naive.
+
+    NumPy datetime64 arrays are treated as UTC times and converted to wall
+    times in the timezone in one vectorized operation.
+
+    :param datetimes: A sequence of datetimes or a NumPy datetime64 array.
+    :param tzinfo: If specified, convert aware datetimes to this timezone
+                   before removing the timezone.
+
+    :return: A list of naive datetimes, or a datetime64 array of wall times.
+    """
+    if _is_datetime64_array(datetimes):
+        if tzinfo is None:
+            return datetimes
+        return datetimes + _datetime64_offsets(datetimes, tzinfo, local=False)
+
+    if tzinfo is None:
+        return [i.replace(tzinfo=None) if is_aware(i) else i for i in datetimes]
+
+    return [
+        i.astimezone(tzinfo).replace(tzinfo=None) if is_aware(i) else i
+        for i in datetimes
+    ]
 
 
 def is_aware(obj: datetime) -> bool:
@@ -67,9 +174,368 @@ def is_naive(obj: datetime) -> bool:
     return obj.tzinfo is None or obj.tzinfo.utcoffset(obj) is None
 
 
+def format_iso8601(obj: datetime) -> str:
+    """Format a datetime as an ISO 8601 string.
+
+    The output matches datetime.isoformat. The text up to the second, and the
+    offset, are cached because logs and API responses repeat the same seconds.
+
+    :param obj: A datetime to format.
+
+    :return: An ISO 8601 formatted datetime.
+    """
+    date_time, offset = _format_second(
+        obj.year,
+        obj.month,
+        obj.day,
+        obj.hour,
+        obj.minute,
+        obj.second,
+        obj.tzinfo,
+        obj.fold,
+    )
+    microsecond = obj.microsecond
+    if microsecond:
+        return f"{date_time}.{microsecond:06d}{offset}"
+
+    return date_time + offset
+
+
+def format_timestamp(timestamp: float) -> str:
+    """Format a POSIX timestamp as an ISO 8601 UTC string.
+
+    The output matches datetime.isoformat for the equivalent UTC datetime,
+    including how microseconds are rounded. The text up to the second is
+    cached.
+
+    :param timestamp: A POSIX timestamp, such as the result of time.time().
+
+    :return: An ISO 8601 formatted UTC datetime.
+    """
+    fraction, seconds = math.modf(timestamp)
+    microsecond = round(fraction * 1e6)
+    if microsecond >= 1000000:
+        microsecond -= 1000000
+        seconds += 1
+    elif microsecond < 0:
+        microsecond += 1000000
+        seconds -= 1
+
+    date_time = _format_utc_second(int(seconds))
+    if microsecond:
+        return f"{date_time}.{microsecond:06d}+00:00"
+
+    return date_time + "+00:00"
+
+
+def parse_iso8601(value: str) -> Optional[Union[date, datetime]]:
+    """Parse an ISO 8601 date or datetime string.
+
+    Dates must look like YYYY-MM-DD. Datetimes must look like
+    YYYY-MM-DDTHH:MM:SS, followed by optional fractional seconds of any
+    precision and an optional Z or +/-HH:MM offset. Fractional seconds beyond
+    microseconds are truncated.
+
+    :param value: The string to parse.
+
+    :return: A date or datetime, or None if the string is neither.
+    """
+    length = len(value)
+    if length < 10 or value[4] != "-" or value[7] != "-":
+        return None
+
+    try:
+        if length == 10:
+            return date.fromisoformat(value)
+
+        if (
+            length < 19
+            or value[10] != "T"
+            or value[13] != ":"
+            or value[16] != ":"
+        ):
+            return None
+
+        if value[-1] == "Z":
+            value = value[:-1] + "+00:00"
+            length += 5
+
+        if length > 19 and value[19] == ".":
+            offset_index = max(value.find("+", 20), value.find("-", 20))
+            if offset_index == -1:
+                offset_index = length
+            fraction = value[20:offset_index]
+            if not fraction.isdigit():
+                return None
+            if len(fraction) not in (3, 6):
+                # Older versions of Python only accept 3 or 6 digits.
+                value = "%s%s%s" % (
+                    value[:20],
+                    fraction[:6].ljust(6, "0"),
+                    value[offset_index:],
+                )
+
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
 def utcnow() -> datetime:
     """Create a timezone-aware datetime at the current UTC time.
 
     :return: A timezone-aware UTC datetime.
     """
-    return pytz.UTC.localize(datetime.utcnow())  # pylint: disable=E1120
+    now = datetime.now(timezone.utc)
+
+    # Passing pytz.UTC to the constructor is much faster than localize or
+    # replace and gives the same result.
+    return datetime(
+        now.year,
+        now.month,
+        now.day,
+        now.hour,
+        now.minute,
+        now.second,
+        now.microsecond,
+        pytz.UTC,
+    )
+
+
+def _is_datetime64_array(obj: Any) -> bool:
+    """Check whether an object is a NumPy datetime64 array.
+
+    :param obj: The object to check.
+
+    :return: True if the object is a datetime64 array, otherwise false.
+    """
+    return _is_ndarray(obj) and obj.dtype.kind == "M"
+
+
+def _is_ndarray(obj: Any) -> bool:
+    """Check whether an object is a NumPy array.
+
+    :param obj: The object to check.
+
+    :return: True if the object is an array, otherwise false.
+    """
+    # NumPy is optional and slow to import. An array can only exist if NumPy
+    # was already imported, so look it up instead of importing it.
+    numpy = sys.modules.get("numpy")
+    return numpy is not None and isinstance(obj, numpy.ndarray)
+
+
+def _replace_datetimes(
+    obj: Any, replace: Callable[[datetime], datetime], inplace: bool
+) -> Any:
+    """Recursively replace datetimes, copying only the changed containers.
+
+    :param obj: A datetime or an object that may contain datetimes.
+    :param replace: A function which returns a replacement datetime, or the
+                    same datetime if it should not change.
+    :param inplace: Whether to mutate dicts and lists instead of copying them.
+
+    :raises TypeError: If the object contains an iterator.
+
+    :return: The object itself if nothing changed, otherwise a copy with the
+             datetimes replaced.
+    """
+    obj_type = type(obj)
+    if obj_type in _ATOMIC_TYPES:
+        return obj
+
+    if isinstance(obj, datetime):
+        return replace(obj)
+
+    if isinstance(obj, dict):
+        changes = {}
+        for key, val in obj.items():
+            new_val = _replace_datetimes(val, replace, inplace)
+            if new_val is not val:
+                changes[key] = new_val
+        if not changes:
+            return obj
+        if not inplace:
+            obj = obj.copy()
+        obj.update(changes)
+        return obj
+
+    if isinstance(obj, list):
+        new_obj = obj
+        for i, val in enumerate(obj):
+            new_val = _replace_datetimes(val, replace, inplace)
+            if new_val is not val:
+                if new_obj is obj and not inplace:
+                    new_obj = obj.copy()
+                new_obj[i] = new_val
+        return new_obj
+
+    if isinstance(obj, (frozenset, set, tuple)):
+        vals = [_replace_datetimes(i, replace, inplace) for i in obj]
+        if all(i is j for i, j in zip(vals, obj)):
+            return obj
+        if hasattr(obj, "_fields"):
+            # Named tuples take their fields as positional arguments.
+            return obj_type(*vals)
+        return obj_type(vals)
+
+    if isinstance(obj, Iterator):
+        raise TypeError(
+            "Cannot replace datetimes in %s; convert it to a list first"
+            % obj_type.__name__
+        )
+
+    # Subclasses of strings and bytes are not collections, and arrays are
+    # returned as is rather than converted to lists of NumPy scalars.
+    if isinstance(obj, (bytearray, bytes, memoryview, str)) or _is_ndarray(obj):
+        return obj
+
+    if isinstance(obj, Iterable):
+        vals = [_replace_datetimes(i, replace, inplace) for i in obj]
+        if all(i is j for i, j in zip(vals, obj)):
+            return obj
+        return vals
+
+    return obj
+
+
+def _datetime64_offsets(
+    arr: "numpy.ndarray", tzinfo: _tzinfo, local: bool
+) -> "numpy.ndarray":
+    """Get the UTC offsets of a timezone for each value of a datetime64 array.
+
+    pytz timezones are resolved with a binary search over their transition
+    times. Other timezones are resolved once per unique value.
+
+    :param arr: The datetime64 array.
+    :param tzinfo: The timezone.
+    :param local: Whether the array contains wall times instead of UTC times.
+
+    :return: A timedelta64 offset or an array of timedelta64 offsets.
+    """
+    import numpy  # pylint: disable=C0415
+
+    fixed_offset = tzinfo.utcoffset(None)
+    if fixed_offset is not None:
+        return numpy.timedelta64(int(fixed_offset.total_seconds()), "s")
+
+    if hasattr(tzinfo, "_utc_transition_times"):
+        offsets = numpy.array(
+            [int(i[0].total_seconds()) for i in tzinfo._transition_info],
+            dtype="timedelta64[s]",
+        )
+        transitions = numpy.array(
+            tzinfo._utc_transition_times, dtype="datetime64[s]"
+        )
+        if local:
+            transitions = transitions + offsets
+        indexes = numpy.searchsorted(transitions, arr, side="right") - 1
+        result = offsets[numpy.maximum(indexes, 0)]
+        _, _, starts, ends = _pytz_transitions(tzinfo)
+        if local and starts:
+            # Resolve wall times which are repeated or skipped by a transition
+            # with localize.
+            starts = numpy.array(starts, dtype="datetime64[s]")
+            ends = numpy.array(ends, dtype="datetime64[s]")
+            windows = numpy.searchsorted(starts, arr, side="right") - 1
+            mask = (windows >= 0) & (arr < ends[numpy.maximum(windows, 0)])
+            if mask.any():
+                result[mask] = _unique_offsets(arr[mask], tzinfo, local)
+        return result
+
+    return _unique_offsets(arr, tzinfo, local)
+
+
+@lru_cache(maxsize=1024)
+def _format_second(
+    year: int,
+    month: int,
+    day: int,
+    hour: int,
+    minute: int,
+    second: int,
+    tzinfo: Optional[_tzinfo],
+    fold: int,
+) -> Tuple[str, str]:
+    """Format a datetime with no microseconds as ISO 8601.
+
+    :param year: The year.
+    :param month: The month.
+    :param day: The day.
+    :param hour: The hour.
+    :param minute: The minute.
+    :param second: The second.
+    :param tzinfo: The timezone, or None for a naive datetime.
+    :param fold: The fold attribute used to disambiguate repeated times.
+
+    :return: A tuple with the date and time, and the UTC offset.
+    """
+    formatted = datetime(
+        year, month, day, hour, minute, second, tzinfo=tzinfo, fold=fold
+    ).isoformat()
+
+    return formatted[:19], formatted[19:]
+
+
+@lru_cache(maxsize=1024)
+def _format_utc_second(seconds: int) -> str:
+    """Format a whole POSIX timestamp as an ISO 8601 date and time.
+
+    :param seconds: The number of seconds since the epoch.
+
+    :return: The date and time without a UTC offset.
+    """
+    return (_EPOCH + timedelta(seconds=seconds)).isoformat()
+
+
+@lru_cache(maxsize=64)
+def _pytz_transitions(
+    tzinfo: _tzinfo,
+) -> Tuple[List[datetime], List[_tzinfo], List[datetime], List[datetime]]:
+    """Get the transitions of a pytz timezone in wall time.
+
+    :param tzinfo: The pytz timezone.
+
+    :return: A tuple with the wall time of each transition in its new offset
+             and the timezone in effect from it, and the start and end wall
+             times of the windows which each transition repeats or skips.
+    """
+    utc_times = tzinfo._utc_transition_times
+    info = tzinfo._transition_info
+    transitions = [datetime.min]
+    starts = []
+    ends = []
+    for i in range(1, len(info)):
+        old, new = info[i - 1][0], info[i][0]
+        transitions.append(utc_times[i] + new)
+        starts.append(utc_times[i] + min(old, new))
+        ends.append(utc_times[i] + max(old, new))
+
+    return transitions, [tzinfo._tzinfos[i] for i in info], starts, ends
+
+
+def _unique_offsets(
+    arr: "numpy.ndarray", tzinfo: _tzinfo, local: bool
+) -> "numpy.ndarray":
+    """Get the UTC offsets of a timezone by resolving each unique value.
+
+    :param arr: The datetime64 array.
+    :param tzinfo: The timezone.
+    :param local: Whether the array contains wall times instead of UTC times.
+
+    :return: An array of timedelta64 offsets.
+    """
+    import numpy  # pylint: disable=C0415
+
+    unique, inverse = numpy.unique(arr, return_inverse=True)
+    # NaT converts to None. Its offset is irrelevant, so use the epoch instead.
+    values = [i or _EPOCH for i in unique.astype("datetime64[us]").tolist()]
+    if local:
+        aware = make_aware_many(values, tzinfo)
+    else:
+        aware = [pytz.UTC.localize(i).astimezone(tzinfo) for i in values]
+    offsets = numpy.array(
+        [int(i.utcoffset().total_seconds()) for i in aware],
+        dtype="timedelta64[s]",
+    )
+
+    return offsets[inverse.reshape(arr.shape)]
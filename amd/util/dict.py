@@ -1,15 +1,28 @@
 """Functions for working with dicts."""
 
+import base64
 import fnmatch
-from itertools import chain
-from typing import Any, Dict, Iterable, List, Tuple
-
-import flatten_json
-from flatten_json import flatten as _flatten
-from flatten_json import unflatten as _unflatten
-
-# Monkeypatch flatten_json because it fails on unicode.
-flatten_json._unflatten_asserts = lambda _, __: None  # pylint: disable=W0212
+import heapq
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import chain, islice
+from operator import itemgetter
+from types import ModuleType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+_MISSING = object()
+"""A placeholder for values that don't exist."""
 
 
 def diff(
@@ -70,7 +83,7 @@ def flatten(dct: Dict[str, Any], sep: str = ".") -> Dict[str, Any]:
 
     :return: A flattened dict.
     """
-    return _flatten(dct, sep)
+    return _flatten_json().flatten(dct, sep)
 
 
 def match(dct: Dict[str, Any], qry: Dict[str, Any], qtype: str = "all") -> bool:
@@ -120,6 +133,77 @@ def project(dct: Dict[str, Any], key_patterns: Iterable[str]) -> Dict[str, Any]:
     return unflatten(projection)
 
 
+def query(
+    records: Iterable[Dict[str, Any]],
+    filter_: Optional[Dict[str, Any]] = None,
+    sort: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    qtype: str = "all",
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Filter, sort, and limit records with querystring parameters.
+
+    The parameters are the ones parsed by amd.util.flask.load_querystring. The
+    records are read lazily. Without a sort, reading stops once the page is
+    full. With a sort and a limit, only the best records are kept in a heap
+    instead of sorting all of them.
+
+    Sort fields support dot notation and are descending when prefixed with a
+    "-". Missing and None values sort last, or first when descending. Ties are
+    broken by the position of the record in the iterable, so pages are stable
+    as long as the order of the records is.
+
+    :param records: The records to query.
+    :param filter_: A query dict to match records against. See match.
+    :param sort: The fields to sort by, in order of precedence.
+    :param limit: The maximum number of records to return.
+    :param cursor: A cursor returned by a previous query with the same sort,
+                   to get the records after the ones it returned.
+    :param qtype: The type of filter query: [all, any, none]
+
+    :raise ValueError: If the cursor is invalid for the sort, or the values of
+                       a sort field can't be ordered.
+
+    :return: A tuple with the matching records, and a cursor for the next page
+             if there are more records.
+    """
+    sort = list(sort or ())
+    fields = [
+        (i[1:].split("."), True) if i.startswith("-") else (i.split("."), False)
+        for i in sort
+    ]
+
+    rows: Iterable[Tuple[int, Dict[str, Any]]] = enumerate(records)
+    if filter_ is not None:
+        matches = _matcher(filter_, qtype)
+        rows = ((i, r) for i, r in rows if matches(r))
+
+    keyed = ((_sort_key(r, fields, i), r) for i, r in rows)
+    if cursor:
+        after = _decode_cursor(cursor, sort, fields)
+        keyed = (i for i in keyed if i[0] > after)
+
+    try:
+        if limit is None:
+            page = sorted(keyed, key=itemgetter(0)) if fields else list(keyed)
+        elif fields:
+            page = heapq.nsmallest(limit + 1, keyed, key=itemgetter(0))
+        else:
+            page = list(islice(keyed, limit + 1))
+    except TypeError as err:
+        # Values of a sort field, or of a sort field and the cursor, have
+        # types which can't be ordered, like int and str, or dicts.
+        raise ValueError("Cannot sort values of these types: %s" % err) from err
+
+    next_cursor = None
+    if limit is not None and len(page) > limit:
+        page = page[:limit]
+        if page:
+            next_cursor = _encode_cursor(page[-1][0], sort)
+
+    return [i for _, i in page], next_cursor
+
+
 def unflatten(dct: Dict[str, Any], sep: str = ".") -> Dict[str, Any]:
     """Recursively unflatten a dict.
 
@@ -128,7 +212,7 @@ def unflatten(dct: Dict[str, Any], sep: str = ".") -> Dict[str, Any]:
 
     :return: An unflattened dict.
     """
-    return _unflatten(dct, sep)
+    return _flatten_json().unflatten(dct, sep)
 
 
 def unique(itr: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -141,3 +225,439 @@ def unique(itr: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
     unique_tuples = {tuple(flatten(i).items()) for i in itr}
 
     return [unflatten(dict(i)) for i in unique_tuples]
+
+
+class IndexedCollection:
+    """An in-memory collection of dicts with hash indexes on dot-paths.
+
+    Queries use the same semantics as the match function. Indexed fields are
+    answered with set intersections and unions, while unindexed fields fall
+    back to scanning the candidate records.
+
+    Records must be modified through update so the indexes stay consistent.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[Dict[str, Any]] = (),
+        indexes: Iterable[str] = (),
+    ) -> None:
+        """Create a collection.
+
+        :param records: An iterable of dicts to insert into the collection.
+        :param indexes: An iterable of dot notation keys to index.
+        """
+        self._next_key = 0
+        self._records: Dict[int, Dict[str, Any]] = {}
+        self._flat_records: Dict[int, Dict[str, Any]] = {}
+        self._indexes: Dict[str, Dict[Any, Set[int]]] = {i: {} for i in indexes}
+
+        for record in records:
+            self.insert(record)
+
+    def __contains__(self, key: int) -> bool:
+        """See base class."""
+        return key in self._records
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """See base class."""
+        return iter(self._records.values())
+
+    def __len__(self) -> int:
+        """See base class."""
+        return len(self._records)
+
+    @property
+    def indexes(self) -> List[str]:
+        """The dot notation keys which are indexed."""
+        return list(self._indexes)
+
+    def add_index(self, key_path: str) -> None:
+        """Index a dot notation key, including any existing records.
+
+        :param key_path: The dot notation key to index.
+        """
+        if key_path in self._indexes:
+            return
+
+        self._indexes[key_path] = {}
+        for key, flat_record in self._flat_records.items():
+            self._index_value(key_path, flat_record, key)
+
+    def delete(self, key: int) -> Dict[str, Any]:
+        """Delete a record from the collection.
+
+        :param key: The key of the record to delete.
+
+        :return: The deleted record.
+        """
+        record = self._records.pop(key)
+        flat_record = self._flat_records.pop(key)
+        for key_path, index in self._indexes.items():
+            if key_path not in flat_record:
+                continue
+            try:
+                keys = index.get(flat_record[key_path])
+            except TypeError:
+                continue
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[flat_record[key_path]]
+
+        return record
+
+    def find(
+        self, qry: Dict[str, Any], qtype: str = "all"
+    ) -> List[Dict[str, Any]]:
+        """Find records which match the query object.
+
+        :param qry: A query dict containing key-value pairs to match against.
+        :param qtype: The type of query: [all, any, none]
+
+        :return: A list of the records that match the query, in insertion
+                 order.
+        """
+        return [self._records[i] for i in self.find_keys(qry, qtype)]
+
+    def find_keys(self, qry: Dict[str, Any], qtype: str = "all") -> List[int]:
+        """Find the keys of records which match the query object.
+
+        :param qry: A query dict containing key-value pairs to match against.
+        :param qtype: The type of query: [all, any, none]
+
+        :return: A list of the keys of the matching records, in insertion
+                 order.
+        """
+        if qtype not in ("all", "any", "none"):
+            raise ValueError("Invalid query type")
+
+        indexed = []
+        unindexed = []
+        for key_path, val in flatten(qry).items():
+            if key_path in self._indexes:
+                indexed.append(self._indexes[key_path].get(val, set()))
+            else:
+                unindexed.append((key_path, val))
+
+        if qtype == "all":
+            if indexed:
+                indexed.sort(key=len)
+                keys = set(indexed[0]).intersection(*indexed[1:])
+            else:
+                keys = self._records.keys()
+            if unindexed:
+                keys = [i for i in keys if self._matches_all(i, unindexed)]
+            return sorted(keys)
+
+        keys = set().union(*indexed)
+        if unindexed:
+            keys.update(
+                i
+                for i in self._records
+                if i not in keys and self._matches_any(i, unindexed)
+            )
+        if qtype == "any":
+            return sorted(keys)
+
+        # Updated records are reinserted into _records, so sort the keys to
+        # return them in insertion order like the other query types.
+        return sorted(i for i in self._records if i not in keys)
+
+    def get(self, key: int) -> Dict[str, Any]:
+        """Get a record by its key.
+
+        :param key: The key of the record to get.
+
+        :return: The record.
+        """
+        return self._records[key]
+
+    def insert(self, record: Dict[str, Any]) -> int:
+        """Insert a record into the collection.
+
+        :param record: The dict to insert.
+
+        :return: The key of the inserted record.
+        """
+        key = self._next_key
+        self._next_key += 1
+        self._add(key, record)
+
+        return key
+
+    def update(self, key: int, record: Dict[str, Any]) -> None:
+        """Replace a record in the collection and update the indexes.
+
+        :param key: The key of the record to replace.
+        :param record: The new dict.
+        """
+        self.delete(key)
+        self._add(key, record)
+
+    def _add(self, key: int, record: Dict[str, Any]) -> None:
+        """Store and index a record under a key.
+
+        :param key: The key of the record.
+        :param record: The dict to store.
+        """
+        flat_record = flatten(record)
+        self._records[key] = record
+        self._flat_records[key] = flat_record
+        for key_path in self._indexes:
+            self._index_value(key_path, flat_record, key)
+
+    def _index_value(
+        self, key_path: str, flat_record: Dict[str, Any], key: int
+    ) -> None:
+        """Add a record's value to an index.
+
+        Unhashable values, such as empty lists and dicts, are not indexed.
+
+        :param key_path: The dot notation key of the index.
+        :param flat_record: The flattened record.
+        :param key: The key of the record.
+        """
+        if key_path not in flat_record:
+            return
+        try:
+            self._indexes[key_path].setdefault(
+                flat_record[key_path], set()
+            ).add(key)
+        except TypeError:
+            pass
+
+    def _matches_all(self, key: int, items: List[Tuple[str, Any]]) -> bool:
+        """Check whether a record contains all of the flattened items.
+
+        :param key: The key of the record.
+        :param items: The flattened key-value pairs to match against.
+
+        :return: True if the record contains every item, otherwise false.
+        """
+        flat_record = self._flat_records[key]
+
+        return all(k in flat_record and flat_record[k] == v for k, v in items)
+
+    def _matches_any(self, key: int, items: List[Tuple[str, Any]]) -> bool:
+        """Check whether a record contains any of the flattened items.
+
+        :param key: The key of the record.
+        :param items: The flattened key-value pairs to match against.
+
+        :return: True if the record contains an item, otherwise false.
+        """
+        flat_record = self._flat_records[key]
+
+        return any(k in flat_record and flat_record[k] == v for k, v in items)
+
+
+def _cursor_default(obj: Any) -> Dict[str, str]:
+    """Tag date and datetime values for json.dumps so they round trip.
+
+    :param obj: An object that is being serialized to JSON.
+
+    :return: A tagged ISO 8601 value.
+    """
+    if isinstance(obj, datetime):
+        return {"$datetime": obj.isoformat()}
+    if isinstance(obj, date):
+        return {"$date": obj.isoformat()}
+    raise TypeError("Cannot use %s in a cursor" % type(obj).__name__)
+
+
+def _cursor_object_hook(dct: Dict[str, Any]) -> Any:
+    """Restore tagged date and datetime values for json.loads.
+
+    :param dct: A dict that has been deserialized from JSON.
+
+    :return: The date or datetime, or the dict.
+    """
+    if "$datetime" in dct:
+        return datetime.fromisoformat(dct["$datetime"])
+    if "$date" in dct:
+        return date.fromisoformat(dct["$date"])
+    return dct
+
+
+def _decode_cursor(
+    cursor: str, sort: List[str], fields: List[Tuple[List[str], bool]]
+) -> Tuple[Any, ...]:
+    """Decode a cursor to the sort key of the last record of a page.
+
+    :param cursor: The cursor.
+    :param sort: The sort the cursor must have been created with.
+    :param fields: The parsed sort fields.
+
+    :raise ValueError: If the cursor is invalid for the sort.
+
+    :return: The sort key.
+    """
+    try:
+        cursor_sort, parts, position = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii")),
+            object_hook=_cursor_object_hook,
+        )
+    except (TypeError, ValueError) as err:
+        raise ValueError("Invalid cursor") from err
+    # Cursors come from clients, so check that the key has the structure
+    # _sort_key creates before it is compared with other keys.
+    if (
+        not isinstance(parts, list)
+        or not all(_is_key_part(i) for i in parts)
+        or not isinstance(position, int)
+    ):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or len(parts) != len(fields):
+        raise ValueError("Invalid cursor for this sort")
+
+    key = [
+        _Descending(tuple(part)) if descending else tuple(part)
+        for part, (_, descending) in zip(parts, fields)
+    ]
+    key.append(position)
+
+    return tuple(key)
+
+
+def _encode_cursor(key: Tuple[Any, ...], sort: List[str]) -> str:
+    """Encode the sort key of the last record of a page as a cursor.
+
+    :param key: The sort key.
+    :param sort: The sort used to create the key.
+
+    :return: The cursor.
+    """
+    parts = [i.value if isinstance(i, _Descending) else i for i in key[:-1]]
+    data = json.dumps(
+        [sort, parts, key[-1]], default=_cursor_default, separators=(",", ":")
+    )
+
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+
+@lru_cache(maxsize=None)
+def _flatten_json() -> ModuleType:
+    """Import and patch flatten_json on first use.
+
+    :return: The flatten_json module.
+    """
+    import flatten_json  # pylint: disable=C0415
+
+    # Monkeypatch flatten_json because it fails on unicode.
+    flatten_json._unflatten_asserts = (  # pylint: disable=W0212
+        lambda _, __: None
+    )
+
+    return flatten_json
+
+
+def _get_path(dct: Dict[str, Any], path: List[str]) -> Any:
+    """Get the value at a path of keys and list indexes in nested dicts.
+
+    :param dct: The dict to get the value from.
+    :param path: The keys and list indexes, as in a flattened key.
+
+    :return: The value, or _MISSING if the path doesn't exist.
+    """
+    value = dct
+    for part in path:
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif (
+            isinstance(value, list)
+            and part.isdigit()
+            and int(part) < len(value)
+        ):
+            value = value[int(part)]
+        else:
+            return _MISSING
+
+    return value
+
+
+def _is_key_part(part: Any) -> bool:
+    """Check whether a decoded cursor value is a sort key part.
+
+    :param part: The decoded value.
+
+    :return: True if the value is a sort key part created by _sort_key as a
+             list, otherwise false.
+    """
+    return isinstance(part, list) and (
+        part == [1] or (len(part) == 2 and part[0] == 0)
+    )
+
+
+def _matcher(
+    qry: Dict[str, Any], qtype: str
+) -> Callable[[Dict[str, Any]], bool]:
+    """Make a function which matches dicts against a query like match.
+
+    The query is flattened once. Instead of flattening each dict, the values
+    at the flattened query keys are looked up by walking their paths.
+
+    :param qry: A query dict containing key-value pairs to match against.
+    :param qtype: The type of query: [all, any, none]
+
+    :return: A function which returns True if a dict matches the query.
+    """
+    if qtype not in ("all", "any", "none"):
+        raise ValueError("Invalid query type")
+
+    items = [(k.split("."), v) for k, v in flatten(qry).items()]
+
+    def matches(dct: Dict[str, Any]) -> bool:
+        found = (_get_path(dct, k) == v for k, v in items)
+        if qtype == "all":
+            return all(found)
+        if qtype == "any":
+            return any(found)
+        return not any(found)
+
+    return matches
+
+
+def _sort_key(
+    record: Dict[str, Any],
+    fields: List[Tuple[List[str], bool]],
+    position: int,
+) -> Tuple[Any, ...]:
+    """Get the sort key of a record.
+
+    :param record: The record.
+    :param fields: The paths of the sort fields, and whether each is
+                   descending.
+    :param position: The position of the record, used to break ties.
+
+    :return: The sort key.
+    """
+    key = []
+    for path, descending in fields:
+        value = _get_path(record, path)
+        part = (1,) if value is None or value is _MISSING else (0, value)
+        key.append(_Descending(part) if descending else part)
+    key.append(position)
+
+    return tuple(key)
+
+
+class _Descending:
+    """Reverses the order of a sort key part."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Tuple[Any, ...]):
+        """Wrap a sort key part.
+
+        :param value: The sort key part.
+        """
+        self.value = value
+
+    def __eq__(self, other):
+        """See base class."""
+        return self.value == other.value
+
+    def __lt__(self, other):
+        """See base class."""
+        return other.value < self.value
@@ -1,18 +1,146 @@
 """Functions for working with errors and exceptions."""
 
 import sys
+import threading
 import traceback
-from typing import Dict
+from collections import OrderedDict, deque
+from time import monotonic
+from types import TracebackType
+from typing import Any, Dict, List, Optional, Tuple, Type
 
+ExcInfo = Tuple[
+    Optional[Type[BaseException]],
+    Optional[BaseException],
+    Optional[TracebackType],
+]
+"""The type of sys.exc_info()."""
 
-def info() -> Dict[str, str]:
+
+def info(capture: Optional["ExceptionCapture"] = None) -> Dict[str, Any]:
     """Get a dict containing information about the last exception.
 
+    :param capture: If specified, use this to capture a bounded and
+                    deduplicated traceback instead of the full traceback.
+
     :return: A dict containing the error traceback, type, and value.
     """
-    exc_type, value, trace = sys.exc_info()
+    exc_info = sys.exc_info()
+    if capture is not None:
+        return capture.capture(exc_info)
+
+    exc_type, value, trace = exc_info
     return {
         "traceback": traceback.format_tb(trace),
         "type": str(exc_type),
         "value": str(value),
     }
+
+
+class ExceptionCapture:
+    """Captures exception information cheaply during error storms.
+
+    Only the innermost frames are extracted, up to a limit. Exceptions are
+    fingerprinted by type and innermost frame. Within a time window, repeats of
+    a fingerprint are captured without a traceback and with a running count.
+    Formatted tracebacks are cached and shared by all callers.
+    """
+
+    def __init__(
+        self, limit: int = 20, window: float = 60.0, cache_size: int = 1024
+    ):
+        """Create an exception capture.
+
+        :param limit: The maximum number of frames to capture.
+        :param window: The number of seconds to deduplicate repeats for. Zero
+                       disables deduplication.
+        :param cache_size: The maximum number of formatted tracebacks and
+                           fingerprints to keep.
+        """
+        self.limit = limit
+        self.window = window
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._tracebacks: OrderedDict = OrderedDict()
+        self._windows: OrderedDict = OrderedDict()
+
+    def capture(self, exc_info: ExcInfo) -> Dict[str, Any]:
+        """Capture information about an exception.
+
+        :param exc_info: The exception information from sys.exc_info().
+
+        :return: A dict containing the error traceback, type, value,
+                 fingerprint, and the number of times the fingerprint was
+                 captured in the current window. The traceback is None for
+                 repeats within the window.
+        """
+        exc_type, value, trace = exc_info
+        frames = deque(maxlen=self.limit)
+        while trace is not None:
+            frames.append(trace)
+            trace = trace.tb_next
+
+        if frames:
+            code = frames[-1].tb_frame.f_code
+            fingerprint = "%s:%s:%s:%d" % (
+                getattr(exc_type, "__qualname__", exc_type),
+                code.co_filename,
+                code.co_name,
+                frames[-1].tb_lineno,
+            )
+        else:
+            fingerprint = str(getattr(exc_type, "__qualname__", exc_type))
+
+        count = self._count(fingerprint)
+        return {
+            "count": count,
+            "fingerprint": fingerprint,
+            "traceback": self._format(frames) if count == 1 else None,
+            "type": str(exc_type),
+            "value": str(value),
+        }
+
+    def _count(self, fingerprint: str) -> int:
+        """Count a capture of a fingerprint in the current window.
+
+        :param fingerprint: The fingerprint of the exception.
+
+        :return: The number of captures in the current window, including this
+                 one.
+        """
+        if not self.window:
+            return 1
+
+        now = monotonic()
+        with self._lock:
+            entry = self._windows.get(fingerprint)
+            if entry is None or now - entry[0] >= self.window:
+                entry = self._windows[fingerprint] = [now, 0]
+                if len(self._windows) > self.cache_size:
+                    self._windows.popitem(last=False)
+            entry[1] += 1
+
+            return entry[1]
+
+    def _format(self, frames: deque) -> List[str]:
+        """Format traceback frames, using the shared cache.
+
+        :param frames: The traceback objects to format, outermost first.
+
+        :return: The formatted frames.
+        """
+        key = tuple((i.tb_frame.f_code, i.tb_lineno) for i in frames)
+        with self._lock:
+            formatted = self._tracebacks.get(key)
+            if formatted is not None:
+                self._tracebacks.move_to_end(key)
+                return formatted
+
+        formatted = traceback.StackSummary.extract(
+            (i.tb_frame, i.tb_lineno) for i in frames
+        ).format()
+        with self._lock:
+            self._tracebacks[key] = formatted
+            if len(self._tracebacks) > self.cache_size:
+                self._tracebacks.popitem(last=False)
+
+        return formatted
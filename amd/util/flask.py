@@ -1,19 +1,38 @@
 """Functions for working with Flask applications for JSON-only APIs."""
 
+import gzip
+import hashlib
 import json as stdlib_json
+import logging
+import os
+import threading
+import tracemalloc
+import zlib
 from collections.abc import Iterable
 from copy import deepcopy
-from functools import wraps
-from typing import Any, Callable, Dict, List, Optional, Union
-
-from flask import Blueprint, Flask, Response, abort, make_response, request
-from prometheus_flask_exporter import PrometheusMetrics
-from prometheus_flask_exporter.multiprocess import GunicornPrometheusMetrics
+from datetime import datetime, timezone
+from functools import lru_cache, partial, wraps
+from logging import Logger
+from random import random
+from time import monotonic, perf_counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    abort,
+    g,
+    has_request_context,
+    make_response,
+    request,
+)
 from werkzeug.exceptions import HTTPException
 
 from amd.util import doc, json
 from amd.util.jsonschema import make_strict
 from amd.util.jsonschema import validate as _validate
+from amd.util.path import ensure
 
 try:
     import importlib.resources as import_resources
@@ -21,22 +40,146 @@ except ImportError:
     # Try importlib_resources which is backported to Python < 3.7.
     import importlib_resources as import_resources
 
-OPEN_API: Dict[str, Optional[Union[bytes, str]]] = {
-    "redoc_html": None,
-    "spec_json": None,
-    "swagger_html": None,
+try:
+    import brotli
+except ImportError:
+    # Brotli is optional. Responses are only gzip compressed without it.
+    brotli = None
+
+BODY: Dict[str, Any] = {"max_size": 32 * 1024 * 1024}
+"""Contains the maximum decompressed size of request bodies in bytes.
+
+A max_size of None disables the limit.
+"""
+
+OPEN_API: Dict[str, Dict[str, "_OpenApiDocument"]] = {}
+"""Contains the OpenAPI documents of each application or blueprint by name."""
+
+_ALLOCATED_BYTES: Dict[Tuple[str, str, str], Any] = {}
+"""Cached STAGE_ALLOCATED_BYTES children by endpoint, stage, and kind."""
+
+_ARCHIVE_LOCK = threading.Lock()
+"""Held while dead process files are archived or metrics are collected.
+
+Both happen in the Gunicorn arbiter, so a scrape never sees a value in both
+the archive and the file of the dead process.
+"""
+
+_ARCHIVE_MODES = {
+    "counter": "sum",
+    "gauge_max": "max",
+    "gauge_min": "min",
+    "gauge_mostrecent": "mostrecent",
+    "gauge_sum": "sum",
+    "histogram": "sum",
+    "summary": "sum",
 }
-"""Contains OpenAPI HTML and JSON data."""
+"""How values of dead processes are merged into archive files by file prefix.
+
+These match how MultiProcessCollector merges the values of processes, so the
+exported values stay the same.
+"""
+
+_CHUNK_SIZE = 64 * 1024
+"""The maximum number of bytes decompressed at once."""
+
+_DECOMPRESSORS: Dict[str, Callable[[], Any]] = {
+    "deflate": zlib.decompressobj,
+    "gzip": partial(zlib.decompressobj, 16 + zlib.MAX_WBITS),
+    "x-gzip": partial(zlib.decompressobj, 16 + zlib.MAX_WBITS),
+}
+"""Functions which create a decompressor by Content-Encoding."""
+
+_STAGE_DURATIONS: Dict[Tuple[str, str], Any] = {}
+"""Cached STAGE_DURATION children by endpoint and stage."""
+
+_TRACING: Dict[str, Any] = {"requests": 0, "started": False}
+"""Contains the number of sampled requests being profiled.
+
+started is whether tracing was started for them, rather than by other code.
+"""
+
+_TRACING_LOCK = threading.Lock()
+"""Held while tracing is started or stopped for sampled requests."""
+
+
+def __getattr__(name: str) -> Any:
+    """Create the attributes which need prometheus_client on first access.
+
+    prometheus_client is slow to import, so CachedCollectorRegistry,
+    STAGE_ALLOCATED_BYTES, and STAGE_DURATION are only created when used. See
+    PEP 562.
+
+    :param name: The name of the attribute.
+
+    :return: The attribute.
+    """
+    if name == "CachedCollectorRegistry":
+        return _cached_collector_registry()
+    if name == "STAGE_ALLOCATED_BYTES":
+        return _stage_allocated_bytes()
+    if name == "STAGE_DURATION":
+        return _stage_duration()
+
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def configure_body(max_size: Optional[int] = 32 * 1024 * 1024) -> None:
+    """Configure the maximum decompressed size of request bodies.
+
+    Bodies larger than this are rejected with a 413 error as soon as the limit
+    is exceeded, which guards against decompression bombs.
+
+    :param max_size: The maximum size in bytes, or None to disable the limit.
+    """
+    BODY.update(max_size=max_size)
+
+
+def gunicorn_child_exit(_: Any, worker: Any) -> None:
+    """Clean up the Prometheus files of an exited Gunicorn worker.
+
+    Use this as the child_exit hook in the Gunicorn config module. Live gauges
+    are removed. Counters, histograms, and summaries are added to one archive
+    file per type, so scrapes don't slow down as workers are recycled.
+
+    :param _: The unused Gunicorn arbiter.
+    :param worker: The exited Gunicorn worker.
+    """
+    # pylint: disable=C0415
+    from prometheus_client.multiprocess import mark_process_dead
+
+    path = _multiprocess_dir()
+    mark_process_dead(worker.pid, path)
+    _archive_process_files(worker.pid, path)
+
+
+def gunicorn_on_starting(_: Any) -> None:
+    """Reset the Prometheus multiprocess directory when Gunicorn starts.
+
+    Use this as the on_starting hook in the Gunicorn config module. Files left
+    by a previous run are removed so their values are not exported again.
+
+    :param _: The unused Gunicorn arbiter.
+    """
+    path = _multiprocess_dir()
+    ensure(path)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
 
 
 def load_body() -> Union[Dict[str, Any], List[Any]]:
     """Parse the request body with a JSON loader.
 
-    Handles date types and unicode.
+    Handles date types and unicode. Bodies with a gzip or deflate
+    Content-Encoding are decompressed. See configure_body for the size limit.
 
     :return: A dictionary or list with the request body.
     """
-    return json.loads(request.get_data())
+    with _StageTimer("body"):
+        body = _read_body()
+    with _StageTimer("parse"):
+        return json.loads(body)
 
 
 def load_querystring() -> Dict[str, Any]:
@@ -62,12 +205,22 @@ def load_querystring() -> Dict[str, Any]:
     return json.loads(json.dumps(args))
 
 
-def make_json_response(obj: Any) -> Response:
+def make_json_response(obj: Any, sparse: bool = False) -> Response:
     """Make a readable JSON response that is compliant with the JSON:API spec.
 
     Handles date types and unicode.
     This should be the only function used to return JSON from a Flask route.
 
+    With sparse=True, sparse fieldsets in the querystring are applied to the
+    data before it is encoded, so unselected fields are never serialized. It
+    is opt-in per endpoint, since a fields parameter may mean something else
+    to other endpoints. JSON:API fields[TYPE] parameters select the attributes
+    and relationships of resource objects of that type, in data and included.
+    A generic fields parameter selects the fields of other records in data,
+    with dot notation for nested fields.
+        ?fields[articles]=title,author&fields[people]=name
+        ?fields=id,name,owner.email
+
     JSON:API Specification: https://jsonapi.org/
 
     The Flask convention is to use:
@@ -90,6 +243,7 @@ def make_json_response(obj: Any) -> Response:
         https://tools.ietf.org/html/rfc8259
 
     :param obj: The object to convert to the body of the JSON response.
+    :param sparse: Whether to apply sparse fieldsets from the querystring.
 
     :return: A Flask response.
     """
@@ -99,7 +253,11 @@ def make_json_response(obj: Any) -> Response:
     ):
         obj = {"data": obj}
 
-    json_data = json.readable(obj)
+    with _StageTimer("encode"):
+        fieldsets = _get_fieldsets() if sparse else None
+        if fieldsets is not None:
+            obj = _apply_fieldsets(obj, *fieldsets)
+        json_data = json.readable(obj)
     response = make_response(json_data)
     response.mimetype = "application/vnd.api+json"
 
@@ -116,7 +274,7 @@ def make_schema_response(schema: Any) -> Response:
     """
     strict_schema = make_strict(schema)
 
-    return make_json_response(strict_schema)
+    return make_json_response(strict_schema, sparse=False)
 
 
 def register_error_handlers(app: Union[Blueprint, Flask]) -> None:
@@ -126,62 +284,187 @@ def register_error_handlers(app: Union[Blueprint, Flask]) -> None:
     """
     app.register_error_handler(400, _custom400)
     app.register_error_handler(404, _custom404)
+    app.register_error_handler(413, _custom400)
+    app.register_error_handler(415, _custom400)
     app.register_error_handler(500, _custom500)
 
 
 def register_openapi(
-    app: Union[Blueprint, Flask], specfile: str = "spec.json"
+    app: Union[Blueprint, Flask],
+    specfile: str = "spec.json",
+    reload: bool = False,
 ) -> None:
     """Register OpenAPI endpoints. Assigns the root URL.
 
+    Each document is compressed and given an ETag and Last-Modified date once,
+    so responses support conditional requests and Content-Encoding
+    negotiation without further work.
+
     :param app: The Flask application or blueprint to modify.
     :param specfile: The path to the spec file containing OpenAPI JSON. This
                      defaults to spec.json in the folder where Flask is running.
+    :param reload: Whether to read the spec file again when its modification
+                   time changes.
     """
     url_prefix = app.url_prefix if hasattr(app, "url_prefix") else ""
 
-    OPEN_API["redoc_html"] = import_resources.read_text(
-        doc, "redoc.html"
-    ).replace("{URL_PREFIX}", url_prefix)
-    OPEN_API["swagger_html"] = import_resources.read_text(
-        doc, "swagger.html"
-    ).replace("{URL_PREFIX}", url_prefix)
-
-    with open(specfile, "rb") as inf:
-        OPEN_API["spec_json"] = inf.read()
+    documents = OPEN_API[app.name] = {
+        "redoc_html": _OpenApiDocument(
+            "text/html",
+            data=import_resources.read_text(doc, "redoc.html")
+            .replace("{URL_PREFIX}", url_prefix)
+            .encode("utf-8"),
+        ),
+        "spec_json": _OpenApiDocument(
+            "application/json", path=specfile, reload=reload
+        ),
+        "swagger_html": _OpenApiDocument(
+            "text/html",
+            data=import_resources.read_text(doc, "swagger.html")
+            .replace("{URL_PREFIX}", url_prefix)
+            .encode("utf-8"),
+        ),
+    }
 
     app.add_url_rule(
-        "/", endpoint="index", methods=["GET"], view_func=_get_index
+        "/",
+        endpoint="index",
+        methods=["GET"],
+        view_func=documents["redoc_html"].send,
     )
     app.add_url_rule(
-        "/spec", endpoint="spec", methods=["GET"], view_func=_get_spec_index
+        "/spec",
+        endpoint="spec",
+        methods=["GET"],
+        view_func=documents["spec_json"].send,
     )
     app.add_url_rule(
         "/swagger",
         endpoint="swagger",
         methods=["GET"],
-        view_func=_get_swagger_index,
+        view_func=documents["swagger_html"].send,
     )
 
 
 def register_prometheus(app: Union[Blueprint, Flask], debug: bool) -> None:
     """Register Prometheus endpoints. Assumes Gunicorn is used for production.
 
+    In production, the Gunicorn config module should use gunicorn_on_starting,
+    gunicorn_child_exit, and start_metrics_server in its hooks.
+
     :param app: The Flask application or blueprint to modify.
     :param debug: Whether the Flask application is running in debug mode.
     """
+    # pylint: disable=C0415
     if debug:
         # Running in debug mode.
+        from prometheus_flask_exporter import PrometheusMetrics
+
         PrometheusMetrics(app)
     else:
         # Running with Gunicorn.
+        from prometheus_flask_exporter.multiprocess import (
+            GunicornPrometheusMetrics,
+        )
+
         GunicornPrometheusMetrics(app)
 
 
+def register_profiling(
+    app: Union[Blueprint, Flask],
+    sample_rate: float = 0.01,
+    threshold: Optional[int] = 64 * 1024 * 1024,
+    top: int = 10,
+    frames: int = 1,
+    logger: Optional[Logger] = None,
+) -> None:
+    """Register memory profiling of a sample of requests with tracemalloc.
+
+    The peak and net bytes allocated by each sampled request, and by each
+    request stage handled by this module, are recorded in the
+    STAGE_ALLOCATED_BYTES histogram, which is exposed by register_prometheus.
+    The stage of the whole request is named total.
+
+    When the peak of a request crosses the threshold, the top allocation sites
+    are logged as a dict at the WARNING level. Use the formatters in
+    amd.util.log to write it as JSON.
+
+    Tracing slows down a request several times over, and is only enabled
+    while sampled requests are handled. Peaks and net values are only accurate
+    when a worker handles one request at a time, as Gunicorn sync workers do.
+    Otherwise they include the allocations of concurrent requests.
+
+    :param app: The Flask application or blueprint to modify.
+    :param sample_rate: The fraction of requests to profile.
+    :param threshold: The peak bytes allocated by a request above which the
+                      top allocation sites are logged, or None to never log
+                      them.
+    :param top: The number of allocation sites to log.
+    :param frames: The number of frames to record for each allocation site.
+                   Each frame makes tracing noticeably slower.
+    :param logger: The logger to use. Defaults to the logger of this module.
+    """
+    app.before_request(
+        partial(
+            _start_profiling,
+            sample_rate=sample_rate,
+            threshold=threshold,
+            top=top,
+            frames=frames,
+            logger=logger or logging.getLogger(__name__),
+        )
+    )
+    app.teardown_request(_finish_profiling)
+
+
+def register_timing(
+    app: Union[Blueprint, Flask], server_timing: bool = False
+) -> None:
+    """Register timing of the request stages handled by this module.
+
+    Stages are recorded in the STAGE_DURATION histogram, which is exposed by
+    register_prometheus.
+
+    :param app: The Flask application or blueprint to modify.
+    :param server_timing: Whether to add the stage durations to each response
+                          as a Server-Timing header.
+    """
+    app.before_request(_start_timing)
+    app.after_request(partial(_finish_timing, server_timing=server_timing))
+
+
+def start_metrics_server(
+    port: int, host: str = "0.0.0.0", scrape_ttl: Optional[float] = None
+) -> None:
+    """Start an HTTP server which exports the metrics of all Gunicorn workers.
+
+    Call this from the when_ready hook in the Gunicorn config module.
+
+    :param port: The port to listen on.
+    :param host: The host to listen on.
+    :param scrape_ttl: If specified, cache the collected metrics for this many
+                       seconds. See CachedCollectorRegistry.
+    """
+    # pylint: disable=C0415
+    from prometheus_client import CollectorRegistry, start_http_server
+    from prometheus_client.multiprocess import MultiProcessCollector
+
+    registry = (
+        _cached_collector_registry()(scrape_ttl)
+        if scrape_ttl
+        else CollectorRegistry()
+    )
+    registry.register(
+        _LockedCollector(MultiProcessCollector(None, _multiprocess_dir()))
+    )
+    start_http_server(port, host, registry=registry)
+
+
 def validate(schema: Dict[str, Any]) -> Callable[[Any], Any]:
     """Wrap a Flask endpoint and validate the body, path, and querystring.
 
-    Converts custom JSON Schema to a strict schema before validating.
+    Converts custom JSON Schema to a strict schema before validating. The body
+    is read as in load_body, and is only read once when both are used.
 
     The schema must describe request data with this structure.
         {
@@ -199,7 +482,8 @@ def validate(schema: Dict[str, Any]) -> Callable[[Any], Any]:
     def inner_wrapper(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            body = request.get_data()
+            with _StageTimer("body"):
+                body = _read_body()
             path = request.view_args
             query = request.args.to_dict()
 
@@ -208,14 +492,17 @@ def validate(schema: Dict[str, Any]) -> Callable[[Any], Any]:
                 # Strict JSON schema validates date and datetime values as
                 # string types with a format. Use the json module from the
                 # standard library to load JSON without parsing dates.
-                request_data["request_body"] = stdlib_json.loads(body)
+                with _StageTimer("parse"):
+                    request_data["request_body"] = stdlib_json.loads(body)
             if path:
                 request_data["request_path"] = deepcopy(path)
             if query:
                 request_data["request_query"] = deepcopy(query)
 
-            strict_schema = make_strict(schema)
-            _, err = _validate(request_data, strict_schema)
+            with _StageTimer("strict"):
+                strict_schema = make_strict(schema)
+            with _StageTimer("validate"):
+                _, err = _validate(request_data, strict_schema)
 
             if err:
                 abort(400, err)
@@ -227,6 +514,183 @@ def validate(schema: Dict[str, Any]) -> Callable[[Any], Any]:
     return inner_wrapper
 
 
+def _apply_fieldsets(
+    obj: Dict[str, Any],
+    fields: Optional[Dict[str, Any]],
+    types: Dict[str, Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Select the fields of the data and included resources of a response.
+
+    :param obj: The response object.
+    :param fields: The field tree of the generic fields parameter, if any.
+    :param types: The field trees of the fields[TYPE] parameters by type.
+
+    :return: A shallow copy of the response object with the fields selected.
+    """
+    obj = dict(obj)
+    for key in ("data", "included"):
+        if key not in obj:
+            continue
+
+        value = obj[key]
+        if isinstance(value, list):
+            obj[key] = [
+                _apply_record_fieldsets(i, fields, types) for i in value
+            ]
+        else:
+            obj[key] = _apply_record_fieldsets(value, fields, types)
+
+    return obj
+
+
+def _apply_record_fieldsets(
+    record: Any,
+    fields: Optional[Dict[str, Any]],
+    types: Dict[str, Dict[str, Any]],
+) -> Any:
+    """Select the fields of a record or JSON:API resource object.
+
+    :param record: The record.
+    :param fields: The field tree of the generic fields parameter, if any.
+    :param types: The field trees of the fields[TYPE] parameters by type.
+
+    :return: The record with the fields selected.
+    """
+    if not isinstance(record, dict):
+        return record
+
+    if "type" in record and "attributes" in record:
+        tree = types.get(record["type"], fields)
+        if tree is None:
+            return record
+
+        record = dict(record)
+        for key in ("attributes", "relationships"):
+            if isinstance(record.get(key), dict):
+                record[key] = _select_fields(record[key], tree)
+        return record
+
+    return record if fields is None else _select_fields(record, fields)
+
+
+def _archive_process_files(pid: int, path: str) -> None:
+    """Add the values of a dead process to the archive files and remove them.
+
+    Multiprocess counters, histograms, summaries, and gauges other than live
+    and all gauges are merged across files, so moving values into one archive
+    file per type and mode keeps the exported values the same. Gauges in all
+    mode are labeled by process, so the values of the dead process are removed.
+
+    :param pid: The ID of the dead process.
+    :param path: The Prometheus multiprocess directory.
+    """
+    # pylint: disable=C0415
+    from prometheus_client.mmap_dict import MmapedDict
+
+    with _ARCHIVE_LOCK:
+        all_file = os.path.join(path, "gauge_all_%d.db" % pid)
+        if os.path.exists(all_file):
+            os.remove(all_file)
+
+        for prefix, mode in _ARCHIVE_MODES.items():
+            process_file = os.path.join(path, "%s_%d.db" % (prefix, pid))
+            if not os.path.exists(process_file):
+                continue
+
+            archive_file = os.path.join(path, "%s_archive.db" % prefix)
+            archived = (
+                {
+                    key: (value, timestamp)
+                    for key, value, timestamp, _ in (
+                        MmapedDict.read_all_values_from_file(archive_file)
+                    )
+                }
+                if os.path.exists(archive_file)
+                else {}
+            )
+            archive = MmapedDict(archive_file)
+            try:
+                for (
+                    key,
+                    value,
+                    timestamp,
+                    _,
+                ) in MmapedDict.read_all_values_from_file(process_file):
+                    if key in archived:
+                        value, timestamp = _merge_archived(
+                            mode, archived[key], (value, timestamp)
+                        )
+                    archive.write_value(key, value, timestamp)
+            finally:
+                archive.close()
+            os.remove(process_file)
+
+
+@lru_cache(maxsize=None)
+def _cached_collector_registry() -> type:
+    """Define CachedCollectorRegistry on first use.
+
+    :return: The class.
+    """
+    # pylint: disable=C0415
+    from prometheus_client import CollectorRegistry
+
+    class CachedCollectorRegistry(CollectorRegistry):
+        """A Prometheus registry which caches collected metrics.
+
+        Once the cache is older than the TTL, the next scrape is served from the
+        stale cache while a background thread collects fresh metrics. Only the
+        first scrape waits for collection.
+        """
+
+        def __init__(self, ttl: float = 5.0):
+            """Create a registry. See base class.
+
+            :param ttl: The number of seconds to cache collected metrics for.
+            """
+            CollectorRegistry.__init__(self)
+            self.ttl = ttl
+            self._cache: Optional[List[Any]] = None
+            self._cached_at = 0.0
+            self._cache_lock = threading.Lock()
+            self._refreshing = False
+
+        def collect(self):
+            """See base class."""
+            with self._cache_lock:
+                cache = self._cache
+                refresh = (
+                    cache is not None
+                    and not self._refreshing
+                    and monotonic() - self._cached_at >= self.ttl
+                )
+                if refresh:
+                    self._refreshing = True
+
+            if cache is None:
+                cache = self._refresh()
+            elif refresh:
+                threading.Thread(target=self._refresh, daemon=True).start()
+
+            return iter(cache)
+
+        def _refresh(self) -> List[Any]:
+            """Collect metrics and update the cache.
+
+            :return: The collected metrics.
+            """
+            try:
+                metrics = list(CollectorRegistry.collect(self))
+                with self._cache_lock:
+                    self._cache = metrics
+                    self._cached_at = monotonic()
+                return metrics
+            finally:
+                self._refreshing = False
+
+    return CachedCollectorRegistry
+
+
 def _custom400(error: HTTPException) -> Response:
     """Send a JSON response with error data that is JSON:API compliant.
 
@@ -240,7 +704,7 @@ def _custom400(error: HTTPException) -> Response:
         else [error.description]
     )
     response = make_json_response({"errors": errors})
-    response.status_code = 400
+    response.status_code = error.code or 400
 
     return response
 
@@ -274,28 +738,615 @@ def _custom500(_: HTTPException) -> Response:
     return response
 
 
-def _get_index() -> Response:
-    """Send a ReDoc HTML response to the client.
+def _decompress(
+    data: bytes, decompressobj: Callable[[], Any]
+) -> Iterator[bytes]:
+    """Decompress data in chunks of bounded size.
 
-    :return: A Flask response.
+    Each call to the decompressor produces at most _CHUNK_SIZE bytes, so a
+    small input can't expand into a huge buffer before it is counted. Data
+    after the end of a compressed stream is decompressed as another stream,
+    like the members of a multi-member gzip file.
+
+    :param data: The compressed data.
+    :param decompressobj: A function which creates a decompressor.
+
+    :raise HTTPException: A 400 error if a stream is truncated.
+    :raise zlib.error: If the data is invalid.
+
+    :return: A generator of decompressed chunks.
     """
-    return make_response(OPEN_API["redoc_html"])
+    while data:
+        decompressor = decompressobj()
+        while data:
+            yield decompressor.decompress(data, _CHUNK_SIZE)
+            data = decompressor.unconsumed_tail
+        # All input is consumed, so only a few buffered bytes remain.
+        yield decompressor.flush()
+        if not decompressor.eof:
+            abort(400, "The request body is truncated.")
+        data = decompressor.unused_data
 
 
-def _get_spec_index() -> Response:
-    """Send an OpenAPI specification to the client as JSON.
+def _finish_profiling(_: Optional[BaseException]) -> None:
+    """Record the memory allocated by a sampled request.
 
-    :return: A Flask response.
+    Tracing is stopped once no sampled requests are left, unless it was
+    started by other code.
+
+    :param _: The unused exception raised while handling the request.
     """
-    response = make_response(OPEN_API["spec_json"])
-    response.mimetype = "application/json"
+    profile = g.pop("amd_profile", None)
+    if profile is None:
+        return
+
+    try:
+        profile.finish(request.endpoint or "none")
+    finally:
+        with _TRACING_LOCK:
+            _TRACING["requests"] -= 1
+            if not _TRACING["requests"] and _TRACING["started"]:
+                tracemalloc.stop()
+
+
+def _finish_timing(response: Response, server_timing: bool) -> Response:
+    """Record the stage durations of a request.
+
+    :param response: The Flask response.
+    :param server_timing: Whether to add a Server-Timing header.
+
+    :return: The Flask response.
+    """
+    timings = g.pop("amd_timings", None)
+    start = g.pop("amd_timing_start", None)
+    if timings is None:
+        return response
+
+    endpoint = request.endpoint or "none"
+    for stage, seconds in timings.items():
+        key = (endpoint, stage)
+        histogram = _STAGE_DURATIONS.get(key)
+        if histogram is None:
+            histogram = _STAGE_DURATIONS[key] = _stage_duration().labels(*key)
+        histogram.observe(seconds)
+
+    if server_timing:
+        timings["total"] = perf_counter() - start
+        response.headers["Server-Timing"] = ", ".join(
+            "%s;dur=%.3f" % (stage, seconds * 1000)
+            for stage, seconds in timings.items()
+        )
 
     return response
 
 
-def _get_swagger_index() -> Response:
-    """Send a Swagger UI HTML response to the client.
+def _get_fieldsets() -> (
+    Optional[Tuple[Optional[Dict[str, Any]], Dict[str, Dict[str, Any]]]]
+):
+    """Parse the sparse fieldsets of the request once and cache them.
 
-    :return: A Flask response.
+    :return: The field tree of the generic fields parameter and the field
+             trees of the fields[TYPE] parameters by type, or None if the
+             request has no fields parameters or there is no request.
+    """
+    if not has_request_context():
+        return None
+    if "amd_fieldsets" in g:
+        return g.amd_fieldsets
+
+    fields = None
+    types = {}
+    for key, value in request.args.items():
+        if key == "fields":
+            fields = _parse_fields(value)
+        elif key.startswith("fields[") and key.endswith("]"):
+            types[key[7:-1]] = _parse_fields(value)
+
+    fieldsets = None if fields is None and not types else (fields, types)
+    g.amd_fieldsets = fieldsets
+
+    return fieldsets
+
+
+def _merge_archived(
+    mode: str, archived: Tuple[float, float], value: Tuple[float, float]
+) -> Tuple[float, float]:
+    """Merge a value of a dead process with its archived value.
+
+    :param mode: How to merge the values. See _ARCHIVE_MODES.
+    :param archived: The archived value and timestamp.
+    :param value: The value and timestamp of the dead process.
+
+    :return: The merged value and timestamp.
     """
-    return make_response(OPEN_API["swagger_html"])
+    if mode == "sum":
+        return archived[0] + value[0], value[1]
+    if mode == "max":
+        return max(archived[0], value[0]), value[1]
+    if mode == "min":
+        return min(archived[0], value[0]), value[1]
+
+    return max(archived, value, key=lambda i: i[1])
+
+
+def _multiprocess_dir() -> str:
+    """Get the Prometheus multiprocess directory from the environment.
+
+    :return: The path of the directory.
+    """
+    path = os.environ.get(
+        "PROMETHEUS_MULTIPROC_DIR", os.environ.get("prometheus_multiproc_dir")
+    )
+    if not path:
+        raise ValueError("PROMETHEUS_MULTIPROC_DIR must be set")
+
+    return path
+
+
+def _parse_fields(value: str) -> Dict[str, Any]:
+    """Parse a comma-separated list of fields into a tree.
+
+    :param value: The fields, with dot notation for nested fields.
+
+    :return: A dict of the selected fields. Values are the trees of nested
+             fields, or None to select the whole field.
+    """
+    tree: Dict[str, Any] = {}
+    for field in value.split(","):
+        node = tree
+        parts = [i for i in field.strip().split(".") if i]
+        for index, part in enumerate(parts):
+            if index == len(parts) - 1:
+                node[part] = None
+            elif node.get(part, {}) is None:
+                # The whole field is already selected.
+                break
+            else:
+                node = node.setdefault(part, {})
+
+    return tree
+
+
+def _read_body() -> bytes:
+    """Read and decompress the request body once and cache it.
+
+    The raw body is read with request.get_data, so it stays available to other
+    code. The maximum size also limits the request's max_content_length, so
+    reading stops as soon as a raw body is too large. Compressed bodies are
+    decompressed in chunks, so a decompression bomb is rejected before it is
+    fully expanded.
+
+    :raise HTTPException: A 400 error if the body can't be decompressed, a 413
+                          error if it is larger than the maximum size, or a
+                          415 error if its Content-Encoding isn't supported.
+
+    :return: The decompressed body.
+    """
+    if "amd_body" in g:
+        return g.amd_body
+
+    encoding = request.headers.get("Content-Encoding", "").strip().lower()
+    if encoding not in ("", "identity") and encoding not in _DECOMPRESSORS:
+        abort(415, "Content-Encoding %s is not supported." % encoding)
+
+    max_size = BODY["max_size"]
+    too_large = "The request body is larger than %s bytes." % max_size
+    # Compression only makes incompressible data a few bytes larger, so the
+    # raw body has the same limit. Werkzeug rejects a larger Content-Length
+    # before reading, but silently stops reading a chunked body at the limit,
+    # so one more byte is read to tell whether the body is too large.
+    limit = request.max_content_length
+    if max_size is not None and (limit is None or limit > max_size + 1):
+        request.max_content_length = max_size + 1
+
+    body = request.get_data()
+    if max_size is not None and len(body) > max_size:
+        abort(413, too_large)
+    if encoding in _DECOMPRESSORS:
+        chunks = []
+        size = 0
+        try:
+            for chunk in _decompress(body, _DECOMPRESSORS[encoding]):
+                chunks.append(chunk)
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    abort(413, too_large)
+        except zlib.error:
+            abort(400, "The request body can't be decompressed.")
+        body = b"".join(chunks)
+
+    g.amd_body = body
+
+    return body
+
+
+def _select_fields(obj: Any, tree: Dict[str, Any]) -> Any:
+    """Select fields from a dict, or from each dict in a list.
+
+    Only the selected fields are visited. Their values are not copied.
+
+    :param obj: The dict or list to select fields from.
+    :param tree: The selected fields. See _parse_fields.
+
+    :return: The selection.
+    """
+    if isinstance(obj, dict):
+        selection = {}
+        for key, subtree in tree.items():
+            if key in obj:
+                value = obj[key]
+                selection[key] = (
+                    value if subtree is None else _select_fields(value, subtree)
+                )
+        return selection
+    if isinstance(obj, list):
+        return [_select_fields(i, tree) for i in obj]
+
+    return obj
+
+
+@lru_cache(maxsize=None)
+def _stage_allocated_bytes() -> Any:
+    """Create STAGE_ALLOCATED_BYTES on first use.
+
+    STAGE_ALLOCATED_BYTES is a histogram of the bytes allocated by sampled
+    requests, labeled by endpoint, stage, and kind. Kinds: peak, net
+
+    :return: The histogram.
+    """
+    # pylint: disable=C0415
+    from prometheus_client import Histogram
+
+    return Histogram(
+        "amd_flask_stage_allocated_bytes",
+        "Bytes allocated in each stage of handling a sampled request.",
+        ["endpoint", "stage", "kind"],
+        buckets=tuple(1024 * 4**i for i in range(11)),
+    )
+
+
+@lru_cache(maxsize=None)
+def _stage_duration() -> Any:
+    """Create STAGE_DURATION on first use.
+
+    STAGE_DURATION is a histogram of request stage durations, labeled by
+    endpoint and stage. Stages: body, parse, strict, validate, encode
+
+    :return: The histogram.
+    """
+    # pylint: disable=C0415
+    from prometheus_client import Histogram
+
+    return Histogram(
+        "amd_flask_stage_duration_seconds",
+        "Time spent in each stage of handling a request.",
+        ["endpoint", "stage"],
+        buckets=(
+            0.0001,
+            0.00025,
+            0.0005,
+            0.001,
+            0.0025,
+            0.005,
+            0.01,
+            0.025,
+            0.05,
+            0.1,
+            0.25,
+            0.5,
+            1.0,
+            2.5,
+        ),
+    )
+
+
+def _start_profiling(
+    sample_rate: float,
+    threshold: Optional[int],
+    top: int,
+    frames: int,
+    logger: Logger,
+) -> None:
+    """Start recording the memory allocated by a request if it is sampled.
+
+    See register_profiling for the parameters.
+    """
+    if random() >= sample_rate:
+        return
+
+    with _TRACING_LOCK:
+        if not _TRACING["requests"]:
+            _TRACING["started"] = not tracemalloc.is_tracing()
+            if _TRACING["started"]:
+                tracemalloc.start(frames)
+        _TRACING["requests"] += 1
+    g.amd_profile = _AllocationProfile(threshold, top, logger)
+
+
+def _start_timing() -> None:
+    """Start recording the stage durations of a request."""
+    g.amd_timings = {}
+    g.amd_timing_start = perf_counter()
+
+
+class _AllocationProfile:
+    """Records the memory allocated by a sampled request and its stages."""
+
+    __slots__ = (
+        "dumped",
+        "logger",
+        "peak",
+        "stages",
+        "start",
+        "threshold",
+        "top",
+    )
+
+    def __init__(self, threshold: Optional[int], top: int, logger: Logger):
+        """Create a profile and start recording.
+
+        :param threshold: The peak bytes above which allocation sites are
+                          logged, or None to never log them.
+        :param top: The number of allocation sites to log.
+        :param logger: The logger to use.
+        """
+        self.dumped = False
+        self.logger = logger
+        self.peak = 0
+        self.stages: Dict[str, List[int]] = {}
+        self.threshold = threshold
+        self.top = top
+        self.start = tracemalloc.get_traced_memory()[0]
+        self._reset_peak()
+
+    def finish(self, endpoint: str) -> None:
+        """Record the allocations of the request.
+
+        :param endpoint: The endpoint of the request.
+        """
+        current = self._update_peak()
+        self.stages["total"] = [self.peak, current - self.start]
+        self._check_threshold(endpoint, "total")
+
+        for stage, values in self.stages.items():
+            for kind, value in zip(("peak", "net"), values):
+                key = (endpoint, stage, kind)
+                histogram = _ALLOCATED_BYTES.get(key)
+                if histogram is None:
+                    histogram = _ALLOCATED_BYTES[key] = (
+                        _stage_allocated_bytes().labels(*key)
+                    )
+                histogram.observe(value)
+
+    def finish_stage(self, stage: str, start: int) -> None:
+        """Record the allocations of a stage.
+
+        :param stage: The name of the stage.
+        :param start: The traced bytes when the stage started.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak - self.start)
+        values = self.stages.setdefault(stage, [0, 0])
+        values[0] = max(values[0], peak - start)
+        values[1] += current - start
+        self._check_threshold(request.endpoint or "none", stage)
+
+    def start_stage(self) -> int:
+        """Start recording the peak of a stage.
+
+        :return: The traced bytes when the stage started.
+        """
+        current = self._update_peak()
+        self._reset_peak()
+
+        return current
+
+    def _check_threshold(self, endpoint: str, stage: str) -> None:
+        """Log the top allocation sites once if the threshold is crossed.
+
+        :param endpoint: The endpoint of the request.
+        :param stage: The stage in which the threshold was crossed.
+        """
+        if self.dumped or self.threshold is None or self.peak < self.threshold:
+            return
+
+        self.dumped = True
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        self.logger.warning(
+            {
+                "endpoint": endpoint,
+                "peak_bytes": self.peak,
+                "sites": [
+                    {
+                        "count": i.count,
+                        "size_bytes": i.size,
+                        "traceback": [
+                            "%s:%d" % (j.filename, j.lineno)
+                            for j in i.traceback
+                        ],
+                    }
+                    for i in snapshot.statistics("traceback")[: self.top]
+                ],
+                "stage": stage,
+                "threshold_bytes": self.threshold,
+                "type": "allocations",
+            }
+        )
+
+    @staticmethod
+    def _reset_peak() -> None:
+        """Reset the traced peak to the traced bytes."""
+        if hasattr(tracemalloc, "reset_peak"):
+            # Without reset_peak (Python < 3.9), stage peaks include the peak
+            # of earlier stages.
+            tracemalloc.reset_peak()
+
+    def _update_peak(self) -> int:
+        """Add the traced peak to the peak of the request.
+
+        :return: The traced bytes.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak - self.start)
+
+        return current
+
+
+class _LockedCollector:
+    """A collector which doesn't collect while process files are archived."""
+
+    def __init__(self, collector: Any):
+        """Create a collector.
+
+        :param collector: The collector to wrap.
+        """
+        self.collector = collector
+
+    def collect(self) -> List[Any]:
+        """Collect the metrics of the wrapped collector.
+
+        :return: The metrics.
+        """
+        with _ARCHIVE_LOCK:
+            return list(self.collector.collect())
+
+
+class _OpenApiDocument:
+    """An OpenAPI document with precomputed encodings and validators."""
+
+    def __init__(
+        self,
+        mimetype: str,
+        data: Optional[bytes] = None,
+        path: Optional[str] = None,
+        reload: bool = False,
+    ):
+        """Create a document from data or from a file.
+
+        :param mimetype: The mimetype of the document.
+        :param data: The content of the document.
+        :param path: The path to a file containing the document. Used if data
+                     is not specified.
+        :param reload: Whether to read the file again when its modification
+                       time changes.
+        """
+        self.mimetype = mimetype
+        self.path = path
+        self.reload = reload
+        self._lock = threading.Lock()
+        self._mtime = None
+
+        if data is None:
+            self._mtime = os.stat(path).st_mtime
+            with open(path, "rb") as inf:
+                data = inf.read()
+            modified = self._mtime
+        else:
+            modified = datetime.now(timezone.utc).timestamp()
+
+        self._state = self._encode(data, modified)
+
+    def send(self) -> Response:
+        """Send the document, compressed if the client accepts it.
+
+        :return: A Flask response.
+        """
+        if self.reload:
+            self._reload_if_modified()
+
+        variants, etag, last_modified = self._state
+        encoding = request.accept_encodings.best_match(
+            variants, default="identity"
+        )
+
+        response = Response(variants[encoding], mimetype=self.mimetype)
+        if encoding != "identity":
+            response.content_encoding = encoding
+            etag = "%s-%s" % (etag, encoding)
+        if len(variants) > 1:
+            response.vary.add("Accept-Encoding")
+        response.cache_control.no_cache = True
+        response.set_etag(etag)
+        response.last_modified = last_modified
+
+        return response.make_conditional(request)
+
+    @staticmethod
+    def _encode(
+        data: bytes, modified: float
+    ) -> Tuple[Dict[str, bytes], str, datetime]:
+        """Compute the encodings and validators of the document.
+
+        :param data: The content of the document.
+        :param modified: The modification time as a POSIX timestamp.
+
+        :return: The encoded content by encoding, the ETag, and the
+                 modification date.
+        """
+        variants = {}
+        if brotli is not None:
+            variants["br"] = brotli.compress(data, quality=11)
+        variants["gzip"] = gzip.compress(data, 9, mtime=0)
+        variants = {k: v for k, v in variants.items() if len(v) < len(data)}
+        variants["identity"] = data
+
+        etag = hashlib.sha1(data).hexdigest()
+        last_modified = datetime.fromtimestamp(int(modified), timezone.utc)
+
+        return variants, etag, last_modified
+
+    def _reload_if_modified(self) -> None:
+        """Read the file again if its modification time has changed."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            # Keep serving the last version while the file is being replaced.
+            return
+
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path, "rb") as inf:
+                    self._state = self._encode(inf.read(), mtime)
+                self._mtime = mtime
+
+
+class _StageTimer:
+    """A context manager which times and profiles a request stage.
+
+    The stage is timed if timing is registered, and profiled if the request is
+    sampled for profiling.
+    """
+
+    __slots__ = ("profile", "profile_start", "stage", "start", "timings")
+
+    def __init__(self, stage: str):
+        """Create a timer.
+
+        :param stage: The name of the stage.
+        """
+        self.stage = stage
+        self.start = 0.0
+        self.timings = g.get("amd_timings")
+        self.profile = g.get("amd_profile")
+        self.profile_start = 0
+
+    def __enter__(self):
+        """Start the timer."""
+        if self.profile is not None:
+            self.profile_start = self.profile.start_stage()
+        if self.timings is not None:
+            self.start = perf_counter()
+
+    def __exit__(self, *_):
+        """Add the elapsed time to the request's stage durations."""
+        if self.timings is not None:
+            self.timings[self.stage] = (
+                self.timings.get(self.stage, 0.0) + perf_counter() - self.start
+            )
+        if self.profile is not None:
+            self.profile.finish_stage(self.stage, self.profile_start)
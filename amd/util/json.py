@@ -12,19 +12,11 @@ https://github.com/pallets/itsdangerous/blob/master/src/itsdangerous/_json.py
 """
 
 import json
-import re
+from collections.abc import Iterable, Iterator
 from datetime import date, datetime
 from typing import Any, Dict, List, Optional, Union
 
-from amd.util.datetime import make_aware
-
-DATETIME_REGEX = re.compile(
-    r"^\d{4}-[01]\d-[0-3]\dT[0-2]\d:[0-5]\d:[0-5]\d(\.\d+)?(\+\d{2}:\d{2})?$"
-)
-"""A regular expression to find an ISO 8601 datetime."""
-
-DATE_REGEX = re.compile(r"^\d{4}-[01]\d-[0-3]\d$")
-"""A regular expression to find an ISO 8601 date."""
+from amd.util.datetime import format_iso8601, make_aware, parse_iso8601
 
 
 def dumps(obj: Any) -> str:
@@ -67,15 +59,22 @@ def readable(obj: Any) -> str:
     )
 
 
-def _default(obj: Any) -> Optional[str]:
-    """Handle date and datetime values for json.dumps.
+def _default(obj: Any) -> Optional[Union[str, List[Any]]]:
+    """Handle date, datetime, and collection values for json.dumps.
 
     :param obj: An object that is being serialized to JSON.
 
-    :return: An ISO 8601 formatted value if the object is a date, else None.
+    :return: An ISO 8601 formatted value if the object is a date, a list if it
+             is a collection such as a set, else None.
     """
-    if isinstance(obj, (date, datetime)):
+    if isinstance(obj, datetime):
+        return format_iso8601(obj)
+    if isinstance(obj, date):
         return obj.isoformat()
+    if isinstance(obj, Iterable) and not isinstance(
+        obj, (bytearray, bytes, Iterator, memoryview)
+    ):
+        return list(obj)
     return None
 
 
@@ -88,13 +87,8 @@ def _object_hook(dct: Dict[str, Any]) -> Dict[str, Any]:
     """
     for key, val in dct.items():
         if isinstance(val, str):
-
-            try:
-                if re.match(DATETIME_REGEX, val):
-                    dct[key] = datetime.fromisoformat(val)
-                elif re.match(DATE_REGEX, val):
-                    dct[key] = date.fromisoformat(val)
-            except (TypeError, ValueError):
-                pass
+            parsed = parse_iso8601(val)
+            if parsed is not None:
+                dct[key] = parsed
 
     return dct
@@ -6,17 +6,28 @@ timezone.
 
 from copy import deepcopy
 from datetime import date, datetime
-from functools import partial
-from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
-
-from jsonschema import Draft7Validator, FormatChecker
-from jsonschema._types import TypeChecker
-from jsonschema.exceptions import ValidationError
-from jsonschema.validators import extend
+from functools import lru_cache, partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
 
 from amd.util.datetime import is_aware, utcnow
 from amd.util.dict import find
 
+if TYPE_CHECKING:
+    # jsonschema is slow to import, so it is only imported when validating.
+    from jsonschema import Draft7Validator
+    from jsonschema._types import TypeChecker
+    from jsonschema.exceptions import ValidationError
+
 
 def make_strict(schema: Dict[str, Any]) -> Dict[str, Any]:
     """Make a strict JSON Schema with custom types converted to string types.
@@ -60,10 +71,12 @@ def validate(
     :return: A tuple with a copy of the instance with its default values set,
              and a list of errors.
     """
+    from jsonschema import FormatChecker  # pylint: disable=C0415
+
     # The validator sets defaults on the instance. Do not mutate the input
     # instance.
     instance_copy = deepcopy(instance)
-    validator = _Validator(schema, format_checker=FormatChecker())
+    validator = _extend_validator()(schema, format_checker=FormatChecker())
     errors = list(validator.iter_errors(instance_copy))
 
     return (
@@ -80,11 +93,18 @@ def validate(
     )
 
 
-def _extend_validator() -> Type[Draft7Validator]:
+@lru_cache(maxsize=None)
+def _extend_validator() -> Type["Draft7Validator"]:
     """Extend the Draft 7 validator with custom type checkers and validation.
 
+    The class is built on first use and cached.
+
     :return: A class definition for a custom Draft 7 JSON Schema validator.
     """
+    # pylint: disable=C0415
+    from jsonschema import Draft7Validator
+    from jsonschema.validators import extend
+
     custom_type_checks = {"date": _is_date, "datetime": _is_datetime}
     extended_type_checker = Draft7Validator.TYPE_CHECKER.redefine_many(
         custom_type_checks
@@ -104,7 +124,7 @@ def _extend_validator() -> Type[Draft7Validator]:
     )
 
 
-def _is_date(_: Optional[TypeChecker], instance: Any) -> bool:
+def _is_date(_: Optional["TypeChecker"], instance: Any) -> bool:
     """Check whether an instance is a date.
 
     :param _: The unused type checker.
@@ -115,7 +135,7 @@ def _is_date(_: Optional[TypeChecker], instance: Any) -> bool:
     return isinstance(instance, date)
 
 
-def _is_datetime(_: Optional[TypeChecker], instance: Any) -> bool:
+def _is_datetime(_: Optional["TypeChecker"], instance: Any) -> bool:
     """Check whether an instance is a datetime. Does not accept naive datetimes.
 
     :param _: The unused type checker.
@@ -128,10 +148,10 @@ def _is_datetime(_: Optional[TypeChecker], instance: Any) -> bool:
 
 def _validate_properties_with_defaults(
     validate_properties: Callable[
-        [Draft7Validator, Dict[str, Any], Dict[str, Any], Dict[str, Any]],
-        Iterable[ValidationError],
+        ["Draft7Validator", Dict[str, Any], Dict[str, Any], Dict[str, Any]],
+        Iterable["ValidationError"],
     ],
-    validator: Draft7Validator,
+    validator: "Draft7Validator",
     properties: Dict[str, Any],
     instance: Dict[str, Any],
     schema: Dict[str, Any],
@@ -162,7 +182,3 @@ def _validate_properties_with_defaults(
 
     for error in validate_properties(validator, properties, instance, schema):
         yield error
-
-
-_Validator: Draft7Validator = _extend_validator()
-"""The custom validator to use with the validate method."""
@@ -1,15 +1,77 @@
 """Functions for working with logging."""
 
+import atexit
 import logging
 import os
+import queue
 import sys
+import threading
+import time
 import traceback
+from collections.abc import Iterator
 from datetime import datetime
 from functools import wraps
-from logging import FileHandler, Formatter, Logger, StreamHandler
-from typing import Any, Callable
+from itertools import count
+from json.encoder import encode_basestring
+from logging import FileHandler, Formatter, Handler, Logger, StreamHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from amd.util import json
+from amd.util.datetime import format_timestamp
+from amd.util.error import ExceptionCapture
+from amd.util.path import ensure
+
+FAST_JSON_FIELDS = (
+    "created",
+    "exc_info",
+    "file",
+    "function",
+    "level",
+    "line",
+    "message",
+    "module",
+    "name",
+    "path",
+)
+"""The default fields written by FastJsonFormatter."""
+
+_CALL_SITE_FIELDS = {
+    "file": "filename",
+    "function": "funcName",
+    "level": "levelname",
+    "line": "lineno",
+    "module": "module",
+    "name": "name",
+    "path": "pathname",
+    "process": "process",
+}
+"""Fields which are the same for every record from a logger call site."""
+
+_PIPELINE: Dict[str, Any] = {"listener": None}
+"""Contains the listener started by the last call to configure_production."""
+
+_RECORD_FIELDS = {
+    "args",
+    "created",
+    "exc_info",
+    "exc_text",
+    "message",
+    "thread",
+    "thread_name",
+    "timestamp",
+}
+"""Fields which are different for every record."""
+
+_RECORD_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None))
+).union(("asctime", "message"))
+"""The attributes of a log record which are not extra fields."""
+
+_RECORD_ATTRIBUTE_COUNT = len(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None))
+)
+"""The number of attributes of a log record without extra fields."""
 
 
 def configure(
@@ -56,37 +118,141 @@ def configure(
         root_logger.addHandler(stream_handler)
 
 
-def log_io(logger: Logger) -> Callable[[Any], Any]:
+def configure_production(
+    file_path: str,
+    level: int = logging.INFO,
+    max_bytes: int = 100 * 2**20,
+    backup_count: int = 5,
+    rotate_interval: Optional[float] = None,
+    queue_size: int = 10000,
+    queue_policy: str = "drop",
+    queue_timeout: Optional[float] = 0.1,
+    batch_size: int = 512,
+    flush_interval: float = 1.0,
+    capture: Optional[ExceptionCapture] = None,
+) -> "BatchingQueueListener":
+    """Configure non-blocking logging that sends JSON to a rotating file.
+
+    Logging calls only put records on a bounded queue. A background thread
+    formats them with FastJsonFormatter and writes them to the file in buffered
+    batches. It will remove and close existing handlers of the root logger. If
+    this was called before, the previous listener is stopped once it has
+    written the records already queued, and its handlers are closed.
+
+    :param file_path: The path of the log file.
+    :param level: The level of output to log.
+    :param max_bytes: Rotate the file before it exceeds this size. Zero
+                      disables size-based rotation.
+    :param backup_count: The number of rotated files to keep.
+    :param rotate_interval: If specified, rotate the file after this many
+                            seconds.
+    :param queue_size: The maximum number of records waiting to be written.
+    :param queue_policy: What to do when the queue is full: [block, drop]
+    :param queue_timeout: How long the block policy waits before dropping a
+                          record. None waits indefinitely.
+    :param batch_size: The maximum number of records to take from the queue
+                       at once.
+    :param flush_interval: The maximum number of seconds between flushes.
+    :param capture: If specified, use this to capture bounded and deduplicated
+                    tracebacks.
+
+    :return: The started listener. It is stopped at exit, or call stop to
+             flush and close the file sooner.
+    """
+    ensure(os.path.dirname(os.path.abspath(file_path)))
+
+    file_handler = BufferedRotatingFileHandler(
+        file_path,
+        max_bytes=max_bytes,
+        backup_count=backup_count,
+        interval=rotate_interval,
+    )
+    file_handler.setFormatter(FastJsonFormatter(capture=capture))
+
+    log_queue = queue.Queue(queue_size)
+    listener = BatchingQueueListener(
+        log_queue,
+        file_handler,
+        batch_size=batch_size,
+        flush_interval=flush_interval,
+    )
+
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+        handler.close()
+    # The queue handler of the previous pipeline is removed, so nothing more
+    # is added to its queue.
+    _stop_pipeline()
+    root_logger.setLevel(level)
+    root_logger.addHandler(
+        BoundedQueueHandler(
+            log_queue, policy=queue_policy, timeout=queue_timeout
+        )
+    )
+
+    listener.start()
+    _PIPELINE["listener"] = listener
+    # Register the exit handler once, however often this is called.
+    atexit.unregister(_stop_pipeline)
+    atexit.register(_stop_pipeline)
+
+    return listener
+
+
+def log_io(
+    logger: Logger,
+    sample_every: int = 1,
+    max_length: Optional[int] = None,
+    timing: bool = False,
+) -> Callable[[Any], Any]:
     """Wrap a function and log input/output at the DEBUG level.
 
-    Input/output must be JSON-serializable.
+    Input/output must be JSON-serializable. Nothing is built unless the logger
+    is enabled for DEBUG, so the wrapper is cheap to leave on hot functions.
+    Exceptions are always logged.
 
     :param logger: The logger object to use for writing all input and output.
+    :param sample_every: Only log the input/output of 1 in this many calls.
+    :param max_length: If specified, truncate strings and summarize containers
+                       longer than this in the logged input/output.
+    :param timing: Whether to log the duration of each call in nanoseconds.
 
     :return: A function wrapper.
     """
     # noqa: D202
     def inner_wrapper(func):
+        calls = count()
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             try:
+                if not logger.isEnabledFor(logging.DEBUG) or (
+                    sample_every > 1 and next(calls) % sample_every
+                ):
+                    return func(*args, **kwargs)
+
                 logger.debug(
                     {
                         "logger": logger.name,
                         "method": func.__name__,
                         "type": "input",
-                        "value": {"args": args, "kwargs": kwargs},
+                        "value": _summarize(
+                            {"args": args, "kwargs": kwargs}, max_length
+                        ),
                     }
                 )
+                start = time.perf_counter_ns() if timing else 0
                 res = func(*args, **kwargs)
-                logger.debug(
-                    {
-                        "logger": logger.name,
-                        "method": func.__name__,
-                        "type": "output",
-                        "value": res,
-                    }
-                )
+                output = {
+                    "logger": logger.name,
+                    "method": func.__name__,
+                    "type": "output",
+                    "value": _summarize(res, max_length),
+                }
+                if timing:
+                    output["duration_ns"] = time.perf_counter_ns() - start
+                logger.debug(output)
                 return res
             except:  # noqa
                 logger.exception({"method": func.__name__})
@@ -100,9 +266,16 @@ def log_io(logger: Logger) -> Callable[[Any], Any]:
 class JsonFormatter(Formatter):
     """A log formatter to write logs as JSON."""
 
-    def __init__(self, *args, **kwargs):
-        """See base class."""
+    def __init__(
+        self, *args, capture: Optional[ExceptionCapture] = None, **kwargs
+    ):
+        """See base class.
+
+        :param capture: If specified, use this to capture bounded and
+                        deduplicated tracebacks.
+        """
         Formatter.__init__(self, *args, **kwargs)
+        self.capture = capture
 
     def format(self, record):
         """See base class."""
@@ -120,7 +293,9 @@ class JsonFormatter(Formatter):
             "name": record.name,
             "path": record.pathname,
         }
-        if record.exc_info:
+        if record.exc_info and self.capture is not None:
+            dct["exc_info"] = self.capture.capture(record.exc_info)
+        elif record.exc_info:
             dct["exc_info"] = {
                 "traceback": traceback.format_tb(record.exc_info[2]),
                 "type": str(record.exc_info[0]),
@@ -128,3 +303,469 @@ class JsonFormatter(Formatter):
             }
 
         return json.dumps(dct)
+
+
+class BatchingQueueListener(QueueListener):
+    """A queue listener which handles records in batches and flushes less.
+
+    Handlers are flushed when the queue is idle, when the listener stops, or
+    at least every flush interval while records keep arriving.
+    """
+
+    def __init__(
+        self,
+        log_queue: queue.Queue,
+        *handlers: Handler,
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+        respect_handler_level: bool = True,
+    ):
+        """Create a listener. See base class.
+
+        :param log_queue: The queue to take records from.
+        :param handlers: The handlers for the records.
+        :param batch_size: The maximum number of records to take from the
+                           queue at once.
+        :param flush_interval: The maximum number of seconds between flushes.
+        :param respect_handler_level: Whether to check each handler's level.
+        """
+        QueueListener.__init__(
+            self,
+            log_queue,
+            *handlers,
+            respect_handler_level=respect_handler_level,
+        )
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    def enqueue_sentinel(self):
+        """See base class."""
+        # The queue may be full, so wait for the writer thread to make room.
+        self.queue.put(self._sentinel)
+
+    def flush(self) -> None:
+        """Flush all of the handlers."""
+        for handler in self.handlers:
+            handler.flush()
+
+    def stop(self):
+        """See base class. Does nothing if the listener is not running."""
+        if self._thread is not None:
+            QueueListener.stop(self)
+
+    def _monitor(self):
+        """See base class."""
+        log_queue = self.queue
+        last_flush = time.monotonic()
+        stop = False
+
+        while not stop:
+            try:
+                records = [log_queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                # The queue is idle.
+                self.flush()
+                last_flush = time.monotonic()
+                continue
+
+            while len(records) < self.batch_size:
+                try:
+                    records.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for record in records:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+                log_queue.task_done()
+
+            if stop or time.monotonic() - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = time.monotonic()
+
+
+class BoundedQueueHandler(QueueHandler):
+    """A queue handler which drops or waits when the queue is full.
+
+    Records are queued as is. Formatting is left to the listener's handlers,
+    so the logging thread does no serialization. Messages should not be
+    mutated after they are logged.
+    """
+
+    def __init__(
+        self,
+        log_queue: queue.Queue,
+        policy: str = "drop",
+        timeout: Optional[float] = 0.1,
+    ):
+        """Create a handler. See base class.
+
+        :param log_queue: The bounded queue to put records on.
+        :param policy: What to do when the queue is full: [block, drop]
+        :param timeout: How long the block policy waits before dropping a
+                        record. None waits indefinitely.
+        """
+        if policy not in ("block", "drop"):
+            raise ValueError("Invalid queue policy")
+
+        QueueHandler.__init__(self, log_queue)
+        self.policy = policy
+        self.timeout = timeout
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record):
+        """See base class."""
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def prepare(self, record):
+        """See base class."""
+        # Records never leave the process, so they do not need to be made
+        # picklable by formatting them here.
+        return record
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """A file handler which buffers writes and rotates by size and time.
+
+    Records are only written when the buffer fills or the handler is flushed,
+    so this is meant to be used with a BatchingQueueListener.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = 0,
+        backup_count: int = 0,
+        interval: Optional[float] = None,
+        buffer_size: int = 2**16,
+    ):
+        """Create a handler. See base class.
+
+        :param filename: The path of the log file.
+        :param max_bytes: Rotate the file before it exceeds this size. Zero
+                          disables size-based rotation.
+        :param backup_count: The number of rotated files to keep. Zero
+                             disables rotation.
+        :param interval: If specified, rotate the file after this many seconds.
+        :param buffer_size: The size of the write buffer in bytes.
+        """
+        self.buffer_size = buffer_size
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval else None
+        self.size = 0
+        RotatingFileHandler.__init__(
+            self,
+            filename,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+        )
+
+    def doRollover(self):
+        """See base class."""
+        RotatingFileHandler.doRollover(self)
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+    def emit(self, record):
+        """See base class."""
+        try:
+            data = (self.format(record) + self.terminator).encode("utf-8")
+            if self._should_rollover(len(data)):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(data)
+            self.size += len(data)
+        except Exception:  # pylint: disable=W0703
+            self.handleError(record)
+
+    def _open(self):
+        """See base class."""
+        stream = open(self.baseFilename, "ab", buffering=self.buffer_size)
+        self.size = stream.tell()
+
+        return stream
+
+    def _should_rollover(self, size: int) -> bool:
+        """Check whether the file should be rotated before writing.
+
+        :param size: The number of bytes about to be written.
+
+        :return: True if the file should be rotated, otherwise false.
+        """
+        if self.backupCount <= 0:
+            return False
+        if self.maxBytes and self.size and self.size + size > self.maxBytes:
+            return True
+
+        return bool(self.rollover_at and time.time() >= self.rollover_at)
+
+
+class FastJsonFormatter(Formatter):
+    """A high-throughput log formatter to write logs as JSON.
+
+    The layout of each logger call site is compiled once into a template with
+    the call site fields already serialized. Only the record fields are
+    serialized per record. Unlike JsonFormatter, messages with arguments are
+    formatted with getMessage.
+
+    Call site fields: file, function, level, line, module, name, path, process
+    Record fields: args, created, exc_info, exc_text, message, thread,
+                   thread_name, timestamp
+    """
+
+    max_templates = 4096
+    """The maximum number of call site templates to cache."""
+
+    def __init__(
+        self,
+        fields: Iterable[str] = FAST_JSON_FIELDS,
+        context: Optional[Dict[str, Any]] = None,
+        extra: bool = True,
+        use_orjson: bool = False,
+        capture: Optional[ExceptionCapture] = None,
+    ):
+        """Create a formatter.
+
+        :param fields: The fields to write, in order.
+        :param context: Constant fields to add to every record, such as the
+                        service name.
+        :param extra: Whether to add extra fields passed to the logger.
+        :param use_orjson: Whether to serialize values with orjson instead of
+                           amd.util.json.
+        :param capture: If specified, use this to capture bounded and
+                        deduplicated tracebacks.
+        """
+        Formatter.__init__(self)
+
+        self.fields = tuple(fields)
+        invalid = set(self.fields) - set(_CALL_SITE_FIELDS) - _RECORD_FIELDS
+        if invalid:
+            raise ValueError("Invalid fields: %s" % ", ".join(sorted(invalid)))
+
+        self.capture = capture
+        self.context = dict(context or {})
+        self.extra = extra
+        self._dumps = _make_orjson_dumps() if use_orjson else json.dumps
+        self._excluded = _RECORD_ATTRIBUTES.union(self.fields, self.context)
+        self._getters = [
+            getattr(self, "_get_" + i)
+            for i in self.fields
+            if i in _RECORD_FIELDS
+        ]
+        self._templates: Dict[Tuple[Any, ...], str] = {}
+
+    def format(self, record):
+        """See base class."""
+        key = (
+            record.name,
+            record.pathname,
+            record.lineno,
+            record.levelno,
+            record.process,
+        )
+        template = self._templates.get(key)
+        if template is None:
+            template = self._compile(record)
+            if len(self._templates) >= self.max_templates:
+                self._templates.clear()
+            self._templates[key] = template
+
+        values = [i(record) for i in self._getters]
+        extra = self._get_extra(record) if self.extra else ""
+        if extra and not self.fields and not self.context:
+            # There is nothing before the extra fields to separate them from.
+            extra = extra[1:]
+        values.append(extra)
+
+        return template % tuple(values)
+
+    def _compile(self, record: logging.LogRecord) -> str:
+        """Compile the template for a logger call site.
+
+        :param record: A record from the call site.
+
+        :return: A %-style template with a placeholder for each record field,
+                 followed by a placeholder for the extra fields.
+        """
+        parts = []
+        for field in self.fields:
+            if field in _CALL_SITE_FIELDS:
+                value = getattr(record, _CALL_SITE_FIELDS[field])
+                parts.append(
+                    '"%s":%s' % (field, self._dumps(value).replace("%", "%%"))
+                )
+            else:
+                parts.append('"%s":%%s' % field)
+        for key, value in self.context.items():
+            parts.append(
+                "%s:%s"
+                % (
+                    encode_basestring(key).replace("%", "%%"),
+                    self._dumps(value).replace("%", "%%"),
+                )
+            )
+
+        return "{%s%%s}" % ",".join(parts)
+
+    def _get_args(self, record: logging.LogRecord) -> str:
+        """Serialize the record's message arguments."""
+        return self._dumps(record.args) if record.args else "[]"
+
+    @staticmethod
+    def _get_created(record: logging.LogRecord) -> str:
+        """Serialize the record's creation time as a POSIX timestamp."""
+        return str(int(record.created))
+
+    def _get_exc_info(self, record: logging.LogRecord) -> str:
+        """Serialize the record's exception information."""
+        if not record.exc_info:
+            return "null"
+        if self.capture is not None:
+            return self._dumps(self.capture.capture(record.exc_info))
+
+        return self._dumps(
+            {
+                "traceback": traceback.format_tb(record.exc_info[2]),
+                "type": str(record.exc_info[0]),
+                "value": str(record.exc_info[1]),
+            }
+        )
+
+    @staticmethod
+    def _get_exc_text(record: logging.LogRecord) -> str:
+        """Serialize the record's cached exception text."""
+        return encode_basestring(record.exc_text) if record.exc_text else "null"
+
+    def _get_extra(self, record: logging.LogRecord) -> str:
+        """Serialize the extra fields passed to the logger.
+
+        :return: The extra fields with a leading comma, or an empty string.
+        """
+        attributes = record.__dict__
+        if len(attributes) <= _RECORD_ATTRIBUTE_COUNT:
+            # Records without extra fields only have the default attributes.
+            return ""
+
+        dumps = self._dumps
+        return "".join(
+            [
+                ",%s:%s" % (encode_basestring(i), dumps(attributes[i]))
+                for i in attributes
+                if i not in self._excluded
+            ]
+        )
+
+    def _get_message(self, record: logging.LogRecord) -> str:
+        """Serialize the record's message, merging any arguments."""
+        msg = record.getMessage() if record.args else record.msg
+        if isinstance(msg, str):
+            return encode_basestring(msg)
+
+        return self._dumps(msg)
+
+    @staticmethod
+    def _get_thread(record: logging.LogRecord) -> str:
+        """Serialize the record's thread ID."""
+        return str(record.thread)
+
+    @staticmethod
+    def _get_thread_name(record: logging.LogRecord) -> str:
+        """Serialize the record's thread name."""
+        return encode_basestring(str(record.threadName))
+
+    @staticmethod
+    def _get_timestamp(record: logging.LogRecord) -> str:
+        """Serialize the record's creation time as ISO 8601."""
+        return '"%s"' % format_timestamp(record.created)
+
+
+def _make_orjson_dumps() -> Callable[[Any], str]:
+    """Make a function which serializes an object to compact JSON with orjson.
+
+    orjson is an optional backend for FastJsonFormatter, so it is only
+    imported here. Naive datetimes are treated as UTC, like amd.util.json.
+
+    :raise ImportError: If orjson is not installed.
+
+    :return: A function which serializes an object to a JSON string.
+    """
+    try:
+        import orjson  # pylint: disable=C0415
+    except ImportError as err:
+        raise ImportError("orjson is not installed") from err
+
+    option = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(
+            obj, default=_orjson_default, option=option
+        ).decode()
+
+    return dumps
+
+
+def _orjson_default(obj: Any) -> Optional[List[Any]]:
+    """Serialize collections as lists and other types as null.
+
+    This matches amd.util.json.
+
+    :param obj: The object which orjson doesn't support.
+
+    :return: A list if the object is a collection such as a set, else None.
+    """
+    if isinstance(obj, Iterable) and not isinstance(
+        obj, (bytearray, bytes, Iterator, memoryview)
+    ):
+        return list(obj)
+    return None
+
+
+def _stop_pipeline() -> None:
+    """Stop the configure_production listener and close its handlers."""
+    listener = _PIPELINE["listener"]
+    _PIPELINE["listener"] = None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _summarize(obj: Any, max_length: Optional[int]) -> Any:
+    """Shorten an object for logging.
+
+    :param obj: The object to shorten.
+    :param max_length: Truncate strings and summarize containers longer than
+                       this. None returns the object unchanged.
+
+    :return: The object, or a shortened copy of it.
+    """
+    if max_length is None:
+        return obj
+
+    if isinstance(obj, str):
+        if len(obj) > max_length:
+            return obj[:max_length] + "..."
+        return obj
+
+    if isinstance(obj, (bytes, bytearray, dict, frozenset, list, set, tuple)):
+        if len(obj) > max_length:
+            return {"length": len(obj), "type": type(obj).__name__}
+        if isinstance(obj, dict):
+            return {k: _summarize(v, max_length) for k, v in obj.items()}
+        if isinstance(obj, (bytes, bytearray)):
+            return obj
+        return [_summarize(i, max_length) for i in obj]
+
+    return obj
@@ -1,10 +1,12 @@
 """Functions for working with objects."""
 
-from collections.abc import Iterable
+import dataclasses
+from collections.abc import Iterable, Mapping
 from datetime import date, datetime, time, timedelta, tzinfo
-from typing import Any
-
-from amd.util import json
+from enum import Enum
+from numbers import Number
+from typing import Any, Callable, Dict, Set, Tuple
+from uuid import UUID
 
 BASE_TYPES = (
     bytes,
@@ -25,46 +27,215 @@ BASE_TYPES = (
 TIME_TYPES = (date, datetime, time, timedelta, tzinfo)
 """The date/time types used for converting object values to a dict."""
 
+_SCALAR_TYPES = (
+    type(None),
+    bytearray,
+    bytes,
+    Enum,
+    memoryview,
+    Number,
+    str,
+    UUID,
+) + TIME_TYPES
+"""The types which are returned as is.
+
+Number includes bool, int, float, complex, Decimal, and Fraction.
+"""
+
+_CONVERTERS: Dict[type, Callable[[Any, Set[int]], Any]] = {}
+"""Cached converters by class."""
 
-def to_dict(obj: Any) -> Any:  # pylint: disable=R0911
+
+def to_dict(obj: Any) -> Any:
     """Recursively convert an object to a dict.
 
-    NOT FOR PRODUCTION. This is meant for easily serializing objects during
-    debugging.
+    Mappings, dataclasses, namedtuples, attrs classes, and other objects become
+    dicts of their fields or public attributes. Other iterables become lists.
+    Scalars, such as numbers, enums, UUIDs, and date/time values, are returned
+    as is. Keys are not stringified, naive datetimes are not localized, and
+    strings are not parsed as dates, as they would be by a JSON round trip.
 
     :param obj: The object to convert.
 
+    :raise ValueError: If the object contains a circular reference.
+
     :return: The dict equivalent of the object.
     """
-    # Try the brute force method.
-    try:
-        return json.loads(json.dumps(obj))
-    except (TypeError, ValueError):
-        pass
-
-    if any(isinstance(obj, i) for i in TIME_TYPES) or isinstance(obj, str):
-        return obj
-
-    if isinstance(obj, dict):
-        return {k: to_dict(v) for k, v in obj.items()}
-
-    if hasattr(obj, "__dict__") and vars(obj):
-        return {
-            k: to_dict(v)
-            for k, v in vars(obj).items()
-            if not callable(v) and not k.startswith("__")
-        }
-
-    if isinstance(obj, Iterable):
-        return [to_dict(i) for i in obj]
-
-    if not any(isinstance(obj, i) for i in BASE_TYPES):
-        attrs = [
-            i
-            for i in dir(obj)
-            if not i.startswith("__") and not callable(getattr(obj, i))
-        ]
-        if attrs:
-            return {i: getattr(obj, i) for i in attrs}
+    return _convert(obj, set())
+
+
+def _convert(obj: Any, seen: Set[int]) -> Any:
+    """Convert an object with the converter for its class.
+
+    :param obj: The object to convert.
+    :param seen: The IDs of the objects being converted, to detect cycles.
+
+    :return: The converted object.
+    """
+    cls = type(obj)
+    converter = _CONVERTERS.get(cls)
+    if converter is None:
+        converter = _CONVERTERS[cls] = _make_converter(cls)
+
+    return converter(obj, seen)
+
+
+def _convert_fields(
+    obj: Any, seen: Set[int], names: Tuple[str, ...]
+) -> Dict[str, Any]:
+    """Convert an object with a fixed set of fields to a dict.
+
+    :param obj: The object to convert.
+    :param seen: The IDs of the objects being converted, to detect cycles.
+    :param names: The names of the fields.
+
+    :return: The converted object.
+    """
+    _enter(obj, seen)
+    result = {}
+    for name in names:
+        try:
+            value = getattr(obj, name)
+        except AttributeError:
+            # Slots may be unset.
+            continue
+        result[name] = _convert(value, seen)
+    seen.discard(id(obj))
+
+    return result
+
+
+def _convert_iterable(obj: Iterable, seen: Set[int]) -> Any:
+    """Convert an iterable to a list.
+
+    :param obj: The object to convert.
+    :param seen: The IDs of the objects being converted, to detect cycles.
+
+    :return: The converted object.
+    """
+    _enter(obj, seen)
+    result = [_convert(i, seen) for i in obj]
+    seen.discard(id(obj))
 
+    return result
+
+
+def _convert_mapping(obj: Mapping, seen: Set[int]) -> Dict[Any, Any]:
+    """Convert a mapping to a dict.
+
+    :param obj: The object to convert.
+    :param seen: The IDs of the objects being converted, to detect cycles.
+
+    :return: The converted object.
+    """
+    _enter(obj, seen)
+    result = {k: _convert(v, seen) for k, v in obj.items()}
+    seen.discard(id(obj))
+
+    return result
+
+
+def _convert_object(obj: Any, seen: Set[int], slots: Tuple[str, ...]) -> Any:
+    """Convert an object to a dict of its public attributes.
+
+    Falls back to a list for iterables, and to the object itself if it has no
+    public attributes.
+
+    :param obj: The object to convert.
+    :param seen: The IDs of the objects being converted, to detect cycles.
+    :param slots: The names of the public slots of the object's class.
+
+    :return: The converted object.
+    """
+    _enter(obj, seen)
+    result = {}
+    for name in slots:
+        try:
+            result[name] = _convert(getattr(obj, name), seen)
+        except AttributeError:
+            # Slots may be unset.
+            pass
+
+    for key, value in getattr(obj, "__dict__", {}).items():
+        if not callable(value) and not key.startswith("__"):
+            result[key] = _convert(value, seen)
+
+    if not result:
+        if isinstance(obj, Iterable):
+            result = [_convert(i, seen) for i in obj]
+        elif not isinstance(obj, BASE_TYPES):
+            for name in dir(obj):
+                if not name.startswith("__"):
+                    value = getattr(obj, name)
+                    if callable(value):
+                        continue
+                    # Properties may return a new object of the same class
+                    # on each access, which the cycle check can't detect.
+                    result[name] = (
+                        value
+                        if type(value) is type(obj)
+                        else _convert(value, seen)
+                    )
+        if not result:
+            result = obj
+    seen.discard(id(obj))
+
+    return result
+
+
+def _enter(obj: Any, seen: Set[int]) -> None:
+    """Mark an object as being converted.
+
+    :param obj: The object to convert.
+    :param seen: The IDs of the objects being converted, to detect cycles.
+
+    :raise ValueError: If the object is already being converted.
+    """
+    key = id(obj)
+    if key in seen:
+        raise ValueError("Circular reference detected")
+    seen.add(key)
+
+
+def _identity(obj: Any, _: Set[int]) -> Any:
+    """Return an object as is.
+
+    :param obj: The object to return.
+    :param _: The unused IDs of the objects being converted.
+
+    :return: The object.
+    """
     return obj
+
+
+def _make_converter(cls: type) -> Callable[[Any, Set[int]], Any]:
+    """Choose the converter for a class.
+
+    :param cls: The class of the objects to convert.
+
+    :return: A function which converts an object and a set of seen IDs.
+    """
+    if issubclass(cls, _SCALAR_TYPES):
+        return _identity
+    if issubclass(cls, tuple) and hasattr(cls, "_fields"):
+        return lambda obj, seen: _convert_fields(obj, seen, cls._fields)
+    if issubclass(cls, Mapping):
+        return _convert_mapping
+    if issubclass(cls, (frozenset, list, range, set, tuple)):
+        return _convert_iterable
+    if dataclasses.is_dataclass(cls):
+        names = tuple(i.name for i in dataclasses.fields(cls))
+        return lambda obj, seen: _convert_fields(obj, seen, names)
+    if hasattr(cls, "__attrs_attrs__"):
+        names = tuple(i.name for i in cls.__attrs_attrs__)
+        return lambda obj, seen: _convert_fields(obj, seen, names)
+
+    slots = []
+    for base in reversed(cls.__mro__):
+        names = base.__dict__.get("__slots__", ())
+        for name in (names,) if isinstance(names, str) else names:
+            if not name.startswith("__") and name not in slots:
+                slots.append(name)
+    slots = tuple(slots)
+
+    return lambda obj, seen: _convert_object(obj, seen, slots)
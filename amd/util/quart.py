@@ -0,0 +1,246 @@
+"""Functions for working with Quart applications for JSON-only async APIs.
+
+These are the ASGI equivalents of the functions in amd.util.flask. Parsing,
+validation, and encoding of large payloads are offloaded to an executor so
+they don't block the event loop.
+"""
+
+import asyncio
+import json as stdlib_json
+from collections.abc import Iterable, Sized
+from concurrent.futures import Executor
+from copy import deepcopy
+from functools import partial, wraps
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from quart import Blueprint, Quart, Response, abort, request
+from werkzeug.exceptions import HTTPException
+
+from amd.util import json
+from amd.util.jsonschema import make_strict
+from amd.util.jsonschema import validate as _validate
+
+OFFLOAD: Dict[str, Any] = {"executor": None, "min_bytes": 8192, "min_items": 64}
+"""Contains the executor used for CPU-bound work and when to use it.
+
+An executor of None uses the default executor of the event loop. Request bodies
+smaller than min_bytes and responses with fewer than min_items records are
+handled on the event loop, since handing them off costs more than it saves.
+"""
+
+
+def configure_offload(
+    executor: Optional[Executor] = None,
+    min_bytes: int = 8192,
+    min_items: int = 64,
+) -> None:
+    """Configure where and when CPU-bound work is offloaded.
+
+    A ProcessPoolExecutor avoids contention on the GIL for large payloads,
+    while a ThreadPoolExecutor avoids pickling them.
+
+    :param executor: The executor to use, or None for the event loop default.
+    :param min_bytes: The minimum request body size to offload parsing and
+                      validation for.
+    :param min_items: The minimum number of records in a response to offload
+                      encoding for.
+    """
+    OFFLOAD.update(executor=executor, min_bytes=min_bytes, min_items=min_items)
+
+
+async def load_body() -> Union[Dict[str, Any], List[Any]]:
+    """Parse the request body with a JSON loader.
+
+    Handles date types and unicode.
+
+    :return: A dictionary or list with the request body.
+    """
+    body = await request.get_data()
+    if len(body) < OFFLOAD["min_bytes"]:
+        return json.loads(body)
+
+    return await _offload(json.loads, body)
+
+
+def load_querystring() -> Dict[str, Any]:
+    """Parse the querystring and handle dates, query params, and unicode.
+
+    This doesn't need to be awaited since the querystring is already parsed.
+
+    :return: A dictionary with querystring parameters.
+    """
+    args = request.args.to_dict()
+
+    # Handle special parameters for querying.
+    if "filter" in args:
+        # Filter is given an underscore because it is often passed as a keyword
+        # argument and "filter" masks Python's built-in function.
+        args["filter_"] = json.loads(args["filter"])
+        del args["filter"]
+    if "limit" in args:
+        args["limit"] = int(args["limit"])
+    if "sort" in args:
+        args["sort"] = args["sort"].split(",")
+
+    # Serialize to JSON and back again to parse date strings into Python
+    # objects.
+    return json.loads(json.dumps(args))
+
+
+async def make_json_response(obj: Any) -> Response:
+    """Make a readable JSON response that is compliant with the JSON:API spec.
+
+    Handles date types and unicode. See amd.util.flask.make_json_response.
+
+    :param obj: The object to convert to the body of the JSON response.
+
+    :return: A Quart response.
+    """
+    # Ensure the data key is present if none of the top-level keys are present.
+    if not isinstance(obj, dict) or all(
+        i not in obj for i in ("data", "errors", "meta")
+    ):
+        obj = {"data": obj}
+
+    data = obj.get("data")
+    if isinstance(data, Sized) and len(data) >= OFFLOAD["min_items"]:
+        json_data = await _offload(json.readable, obj)
+    else:
+        json_data = json.readable(obj)
+
+    return Response(json_data, mimetype="application/vnd.api+json")
+
+
+def register_error_handlers(app: Union[Blueprint, Quart]) -> None:
+    """Register custom error handlers which return JSON responses.
+
+    :param app: The Quart application or blueprint to modify.
+    """
+    app.register_error_handler(400, _custom400)
+    app.register_error_handler(404, _custom404)
+    app.register_error_handler(500, _custom500)
+
+
+def validate(schema: Dict[str, Any]) -> Callable[[Any], Any]:
+    """Wrap a Quart endpoint and validate the body, path, and querystring.
+
+    The schema is converted to a strict schema once, when the endpoint is
+    wrapped. See amd.util.flask.validate for the structure of the schema.
+
+    :param schema: The schema to use for validation.
+
+    :return: A function wrapper.
+    """
+
+    # noqa: D202
+    def inner_wrapper(func):
+        strict_schema = make_strict(schema)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            body = await request.get_data()
+            path = request.view_args
+            query = request.args.to_dict()
+
+            if len(body) < OFFLOAD["min_bytes"]:
+                err = _validate_request(body, path, query, strict_schema)
+            else:
+                err = await _offload(
+                    _validate_request, body, path, query, strict_schema
+                )
+
+            if err:
+                abort(400, err)
+
+            return await func(*args, **kwargs)
+
+        return wrapper
+
+    return inner_wrapper
+
+
+async def _custom400(error: HTTPException) -> Response:
+    """Send a JSON response with error data that is JSON:API compliant.
+
+    :param error: The HTTP exception.
+
+    :return: A Quart response.
+    """
+    errors = (
+        error.description
+        if isinstance(error.description, Iterable)
+        else [error.description]
+    )
+    response = await make_json_response({"errors": errors})
+    response.status_code = 400
+
+    return response
+
+
+async def _custom404(_: HTTPException) -> Response:
+    """Send an empty JSON response to the client.
+
+    :param _: The unused HTTP exception.
+
+    :return: A Quart response.
+    """
+    return Response("", status=404, mimetype="application/json")
+
+
+async def _custom500(_: HTTPException) -> Response:
+    """Send a JSON response with an error message that is JSON:API compliant.
+
+    :param _: The unused HTTP exception.
+
+    :return: A Quart response.
+    """
+    response = await make_json_response(
+        {"errors": ["An unexpected error has occurred."]}
+    )
+    response.status_code = 500
+
+    return response
+
+
+async def _offload(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a function in the configured executor.
+
+    :param func: The function to run. It must be picklable for process pools.
+    :param args: The arguments to pass to the function.
+
+    :return: The return value of the function.
+    """
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(OFFLOAD["executor"], partial(func, *args))
+
+
+def _validate_request(
+    body: bytes,
+    path: Optional[Dict[str, Any]],
+    query: Dict[str, Any],
+    strict_schema: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """Validate request data against a strict schema.
+
+    :param body: The raw request body.
+    :param path: The path parameters.
+    :param query: The querystring parameters.
+    :param strict_schema: The strict schema to validate with.
+
+    :return: The validation errors, if any.
+    """
+    request_data = {}
+    if body:
+        # Strict JSON schema validates date and datetime values as string types
+        # with a format. Use the json module from the standard library to load
+        # JSON without parsing dates.
+        request_data["request_body"] = stdlib_json.loads(body)
+    if path:
+        request_data["request_path"] = deepcopy(path)
+    if query:
+        request_data["request_query"] = deepcopy(query)
+
+    _, err = _validate(request_data, strict_schema)
+
+    return err
@@ -1,14 +1,20 @@
 """Functions for working with strings."""
 
 import re
+from functools import lru_cache
+from typing import Any, Callable, Dict
 
 ALL_CAPS_REGEX = re.compile(r"([a-z0-9])([A-Z])")
 """A regular expression to find all of the capital letters in a string."""
 
+CACHE_SIZE = 4096
+"""The maximum number of memoized conversions per case conversion function."""
+
 FIRST_CAP_REGEX = re.compile(r"(.)([A-Z][a-z]+)")
 """A regular expression to find the first capital letter in a string."""
 
 
+@lru_cache(maxsize=CACHE_SIZE)
 def camel_to_snake(string: str) -> str:
     """Convert a camel case string to snake case.
 
@@ -21,6 +27,46 @@ def camel_to_snake(string: str) -> str:
     return ALL_CAPS_REGEX.sub(r"\1_\2", partial_snake_case).lower()
 
 
+def convert_keys(
+    obj: Any, func: Callable[[str], str], inplace: bool = False
+) -> Any:
+    """Recursively convert the string keys of dicts in nested dicts and lists.
+
+    Each distinct key is converted once per call.
+
+    :param obj: The object to convert.
+    :param func: The function to convert keys with, e.g. camel_to_snake.
+    :param inplace: Whether to modify the dicts and lists in place instead of
+                    copying them.
+
+    :return: The converted object.
+    """
+    return _convert_keys(obj, func, inplace, {})
+
+
+def keys_to_camel(obj: Any, inplace: bool = False) -> Any:
+    """Recursively convert the keys of nested dicts to camel case.
+
+    :param obj: The object to convert.
+    :param inplace: Whether to modify the dicts and lists in place.
+
+    :return: The converted object.
+    """
+    return _convert_keys(obj, snake_to_camel, inplace, {})
+
+
+def keys_to_snake(obj: Any, inplace: bool = False) -> Any:
+    """Recursively convert the keys of nested dicts to snake case.
+
+    :param obj: The object to convert.
+    :param inplace: Whether to modify the dicts and lists in place.
+
+    :return: The converted object.
+    """
+    return _convert_keys(obj, camel_to_snake, inplace, {})
+
+
+@lru_cache(maxsize=CACHE_SIZE)
 def snake_to_camel(string: str) -> str:
     """Convert a snake case string to camel case.
 
@@ -33,3 +79,51 @@ def snake_to_camel(string: str) -> str:
         return parts[0]
 
     return parts[0] + "".join(i.title() for i in parts[1:])
+
+
+def _convert_keys(
+    obj: Any, func: Callable[[str], str], inplace: bool, cache: Dict[str, str]
+) -> Any:
+    """Recursively convert the string keys of dicts in nested dicts and lists.
+
+    :param obj: The object to convert.
+    :param func: The function to convert keys with.
+    :param inplace: Whether to modify the dicts and lists in place.
+    :param cache: Converted keys by original key.
+
+    :return: The converted object.
+    """
+    if isinstance(obj, dict):
+        result = {}
+        for key, value in obj.items():
+            if isinstance(key, str):
+                converted = cache.get(key)
+                if converted is None:
+                    converted = cache[key] = func(key)
+                key = converted
+            if isinstance(value, (dict, list)):
+                value = _convert_keys(value, func, inplace, cache)
+            result[key] = value
+
+        if not inplace:
+            return result
+        obj.clear()
+        obj.update(result)
+        return obj
+
+    if isinstance(obj, list):
+        if not inplace:
+            return [
+                (
+                    _convert_keys(i, func, inplace, cache)
+                    if isinstance(i, (dict, list))
+                    else i
+                )
+                for i in obj
+            ]
+        for value in obj:
+            if isinstance(value, (dict, list)):
+                _convert_keys(value, func, inplace, cache)
+        return obj
+
+    return obj
@@ -0,0 +1 @@
+"""Benchmarks for the amd.util hot paths."""
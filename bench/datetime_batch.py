@@ -0,0 +1,79 @@
+"""Benchmark batch and in-place datetime localization against make_aware.
+
+Usage:
+    python -m bench.datetime_batch --size 200000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+import pytz
+
+from amd.util.datetime import make_aware, make_aware_many
+
+try:
+    import numpy
+except ImportError:
+    # NumPy is optional. The datetime64 case is skipped without it.
+    numpy = None
+
+TIMEZONES = {"utc": pytz.UTC, "new_york": pytz.timezone("America/New_York")}
+"""The timezones to benchmark."""
+
+
+def timed(func: Callable[[], Any], repeat: int) -> float:
+    """Get the best wall time of a function.
+
+    :param func: The function to time.
+    :param repeat: The number of times to run the function.
+
+    :return: The best time in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    start = datetime(2020, 1, 1)
+    datetimes = [start + timedelta(seconds=i * 61) for i in range(args.size)]
+    records = [{"id": i, "at": v} for i, v in enumerate(datetimes)]
+
+    for name, tzinfo in TIMEZONES.items():
+        cases = {
+            "make_aware(list)": lambda: make_aware(datetimes, tzinfo),
+            "make_aware_many(list)": lambda: make_aware_many(datetimes, tzinfo),
+        }
+        if numpy is not None:
+            arr = numpy.array(datetimes, dtype="datetime64[us]")
+            cases["make_aware_many(datetime64)"] = lambda: make_aware_many(
+                arr, tzinfo
+            )
+
+        for case, func in cases.items():
+            seconds = timed(func, args.repeat)
+            print(f"{name:<9} {case:<28} {seconds:.4f}s")
+
+    # Each in-place run after the first has no naive datetimes left, so copy
+    # the records outside the timed section.
+    copies = [[dict(i) for i in records] for _ in range(args.repeat)]
+    seconds = timed(lambda: make_aware(records), args.repeat)
+    print(f"{'records':<9} {'make_aware(copy)':<28} {seconds:.4f}s")
+    seconds = timed(lambda: make_aware(copies.pop(), inplace=True), args.repeat)
+    print(f"{'records':<9} {'make_aware(inplace)':<28} {seconds:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
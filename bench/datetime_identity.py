@@ -0,0 +1,103 @@
+"""Benchmark make_aware on mostly datetime-free payloads.
+
+Compares time and peak memory against the previous implementation, which
+copied every container.
+
+Usage:
+    python -m bench.datetime_identity --size 20000 --ratio 0.01
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+import pytz
+
+from amd.util import json
+from amd.util.datetime import is_naive, make_aware
+
+
+def legacy_make_aware(obj: Any, tzinfo: Any = pytz.UTC) -> Any:
+    """The previous make_aware implementation, kept as a baseline.
+
+    :param obj: A datetime or an object that may contain datetimes.
+    :param tzinfo: The timezone to use for localization.
+
+    :return: A copy of the object with timezone-aware datetimes.
+    """
+    if isinstance(obj, dict):
+        return {k: legacy_make_aware(v, tzinfo) for k, v in obj.items()}
+    if isinstance(obj, Iterable) and not isinstance(obj, str):
+        return [legacy_make_aware(i, tzinfo) for i in obj]
+    if isinstance(obj, datetime) and is_naive(obj):
+        obj = tzinfo.localize(obj)
+    return obj
+
+
+def make_payload(size: int, ratio: float) -> List[Dict[str, Any]]:
+    """Make records where a fraction contain a naive datetime.
+
+    :param size: The number of records.
+    :param ratio: The fraction of records with a naive datetime.
+
+    :return: A list of records.
+    """
+    rnd = random.Random(0)
+    return [
+        {
+            "id": i,
+            "name": "record-%d" % i,
+            "tags": ["a", "b", "c"],
+            "attrs": {"score": rnd.random(), "flags": [True, False]},
+            "updated": datetime(2020, 1, 1) if rnd.random() < ratio else None,
+        }
+        for i in range(size)
+    ]
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Tuple[float, int]:
+    """Measure the best time and the peak memory of a function.
+
+    :param func: The function to measure.
+    :param repeat: The number of timed runs.
+
+    :return: A tuple with the best time in seconds and the peak bytes.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--ratio", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = make_payload(args.size, args.ratio)
+    cases = {
+        "legacy_make_aware": lambda: legacy_make_aware(payload),
+        "make_aware": lambda: make_aware(payload),
+        "json.dumps": lambda: json.dumps(payload),
+    }
+    for name, func in cases.items():
+        seconds, peak = measure(func, args.repeat)
+        print(f"{name:<18} {seconds:.4f}s peak {peak / 2 ** 20:.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
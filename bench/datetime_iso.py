@@ -0,0 +1,68 @@
+"""Microbenchmark the ISO 8601 formatters and parser against the stdlib.
+
+Usage:
+    python -m bench.datetime_iso --number 200000
+"""
+
+import argparse
+import re
+import time
+import timeit
+from datetime import datetime, timezone
+
+import pytz
+
+from amd.util.datetime import (
+    format_iso8601,
+    format_timestamp,
+    parse_iso8601,
+    utcnow,
+)
+
+DATETIME_REGEX = re.compile(
+    r"^\d{4}-[01]\d-[0-3]\dT[0-2]\d:[0-5]\d:[0-5]\d(\.\d+)?(\+\d{2}:\d{2})?$"
+)
+"""The regular expression previously used to detect datetimes."""
+
+
+def stdlib_parse(value: str) -> datetime:
+    """Parse a datetime the way amd.util.json previously did.
+
+    :param value: The string to parse.
+
+    :return: A datetime.
+    """
+    if re.match(DATETIME_REGEX, value):
+        return datetime.fromisoformat(value)
+    return None
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200000)
+    args = parser.parse_args()
+
+    now = time.time()
+    aware = pytz.UTC.localize(datetime.utcfromtimestamp(now))
+    string = aware.isoformat()
+    cases = {
+        "stdlib utcnow": lambda: pytz.UTC.localize(datetime.utcnow()),
+        "utcnow": utcnow,
+        "stdlib isoformat": aware.isoformat,
+        "format_iso8601": lambda: format_iso8601(aware),
+        "stdlib fromtimestamp": lambda: datetime.fromtimestamp(
+            now, timezone.utc
+        ).isoformat(),
+        "format_timestamp": lambda: format_timestamp(now),
+        "stdlib regex parse": lambda: stdlib_parse(string),
+        "parse_iso8601": lambda: parse_iso8601(string),
+        "parse_iso8601 (Z)": lambda: parse_iso8601(string[:-6] + "Z"),
+    }
+    for name, func in cases.items():
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3))
+        print(f"{name:<22} {seconds / args.number * 1e9:8.0f} ns/op")
+
+
+if __name__ == "__main__":
+    main()
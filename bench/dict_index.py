@@ -0,0 +1,84 @@
+"""Benchmark IndexedCollection queries against a full scan with match.
+
+Usage:
+    python -m bench.dict_index --sizes 10000 100000 1000000
+"""
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from amd.util.dict import IndexedCollection, match
+
+QUERIES = {
+    "all": {"meta": {"region": "eu"}, "status": "active"},
+    "any": {"status": "deleted", "meta.owner": 7},
+    "none": {"meta.region": "us"},
+    "unindexed": {"meta.region": "eu", "score": 42},
+}
+"""The queries to benchmark. score is deliberately not indexed."""
+
+
+def make_records(size: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Make synthetic records.
+
+    :param size: The number of records to make.
+    :param seed: The random seed.
+
+    :return: A list of records.
+    """
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "status": rnd.choice(("active", "inactive", "deleted")),
+            "score": rnd.randrange(100),
+            "meta": {
+                "region": rnd.choice(("eu", "us", "ap", "sa")),
+                "owner": rnd.randrange(1000),
+            },
+        }
+        for i in range(size)
+    ]
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[10**4, 10**5, 10**6]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        records = make_records(size)
+
+        start = time.perf_counter()
+        collection = IndexedCollection(
+            records, indexes=["status", "meta.region", "meta.owner"]
+        )
+        print(f"n={size} build {time.perf_counter() - start:.3f}s")
+
+        for name, qry in QUERIES.items():
+            qtype = name if name in ("all", "any", "none") else "all"
+
+            start = time.perf_counter()
+            expected = [i for i in records if match(i, qry, qtype)]
+            scan = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                found = collection.find(qry, qtype)
+            indexed = (time.perf_counter() - start) / args.repeat
+
+            assert found == expected
+            print(
+                f"n={size} {name:<9} scan {scan:.4f}s "
+                f"indexed {indexed:.4f}s speedup {scan / indexed:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
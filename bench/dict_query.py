@@ -0,0 +1,80 @@
+"""Benchmark query against sorting and slicing every record.
+
+Usage:
+    python -m bench.dict_query --records 100000 --limit 20 --pages 5
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List
+
+from amd.util.dict import match, query
+
+
+def make_records(count: int) -> List[Dict[str, Any]]:
+    """Make records to query.
+
+    :param count: The number of records.
+
+    :return: The records.
+    """
+    return [
+        {"id": i, "group": i % 4, "score": (i * 7919) % 1000}
+        for i in range(count)
+    ]
+
+
+def naive_page(
+    records: List[Dict[str, Any]], page: int, limit: int
+) -> List[Dict[str, Any]]:
+    """Filter, sort, and slice a page with the usual route implementation.
+
+    :param records: The records to query.
+    :param page: The index of the page.
+    :param limit: The number of records per page.
+
+    :return: The page.
+    """
+    matches = [i for i in records if match(i, {"group": 1})]
+    matches.sort(key=lambda i: (-i["score"], i["id"]))
+
+    return matches[page * limit : (page + 1) * limit]
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=5)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+
+    start = time.perf_counter()
+    naive = []
+    for page in range(args.pages):
+        naive.extend(naive_page(records, page, args.limit))
+    naive_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pages = []
+    cursor = None
+    for _ in range(args.pages):
+        page, cursor = query(
+            records,
+            filter_={"group": 1},
+            sort=["-score"],
+            limit=args.limit,
+            cursor=cursor,
+        )
+        pages.extend(page)
+    query_seconds = time.perf_counter() - start
+
+    assert [i["id"] for i in pages] == [i["id"] for i in naive]
+    print(f"naive {naive_seconds / args.pages * 1000:10.1f} ms/page")
+    print(f"query {query_seconds / args.pages * 1000:10.1f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
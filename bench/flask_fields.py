@@ -0,0 +1,72 @@
+"""Benchmark sparse fieldsets on a large list response.
+
+Usage:
+    python -m bench.flask_fields --records 2000 --requests 20
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from flask import Flask
+
+from amd.util.flask import make_json_response
+
+QUERIES = ("", "fields=id,name", "fields=id,name,owner.email")
+"""The querystrings to compare."""
+
+
+def make_app(records: int) -> Flask:
+    """Make an app with a large list endpoint.
+
+    :param records: The number of records the endpoint returns.
+
+    :return: A Flask application.
+    """
+    start = datetime(2020, 1, 1, tzinfo=pytz.UTC)
+    data = [
+        {
+            "id": i,
+            "name": "record %d" % i,
+            "description": "A longer description of record %d." % i,
+            "created": start + timedelta(minutes=i),
+            "updated": start + timedelta(minutes=2 * i),
+            "score": i / 3,
+            "tags": ["a", "b", "c"],
+            "owner": {"id": i % 10, "email": "owner%d@example.com" % (i % 10)},
+            "history": [{"at": start, "event": "created"}] * 3,
+        }
+        for i in range(records)
+    ]
+    app = Flask("bench")
+
+    @app.route("/records")
+    def get_records():
+        return make_json_response(data, sparse=True)
+
+    return app
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    client = make_app(args.records).test_client()
+    for query in QUERIES:
+        size = len(client.get("/records?" + query).data)
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            client.get("/records?" + query)
+        seconds = (time.perf_counter() - start) / args.requests
+        print(
+            f"{query or '(all fields)':<28} {seconds * 1000:8.1f} ms/request "
+            f"{size / 1024:8.1f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
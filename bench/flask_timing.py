@@ -0,0 +1,83 @@
+"""Benchmark the overhead of register_timing on the JSON request path.
+
+Usage:
+    python -m bench.flask_timing --requests 3000
+"""
+
+import argparse
+import time
+
+from flask import Flask
+
+from amd.util.flask import (
+    load_body,
+    make_json_response,
+    register_timing,
+    validate,
+)
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "request_body": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "at": {"type": "datetime"},
+            },
+        }
+    },
+}
+"""The schema used to validate the benchmark requests."""
+
+BODY = '{"name": "item", "at": "2020-01-02T03:04:05Z", "tags": ["a", "b"]}'
+"""The benchmark request body."""
+
+
+def make_app(mode: str) -> Flask:
+    """Make an app with timing configured for a mode.
+
+    :param mode: One of: off, metrics, server_timing
+
+    :return: A Flask application.
+    """
+    app = Flask(mode)
+    if mode != "off":
+        register_timing(app, server_timing=mode == "server_timing")
+
+    @app.route("/items", methods=["POST"])
+    @validate(SCHEMA)
+    def post_items():
+        return make_json_response(load_body())
+
+    return app
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Interleave the modes so that machine noise affects them equally.
+    modes = ("off", "metrics", "server_timing")
+    clients = {i: make_app(i).test_client() for i in modes}
+    best = {i: float("inf") for i in modes}
+    for _ in range(args.repeat):
+        for mode, client in clients.items():
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                client.post("/items", data=BODY)
+            seconds = (time.perf_counter() - start) / args.requests
+            best[mode] = min(best[mode], seconds)
+
+    for mode in modes:
+        print(
+            f"{mode:<14} {best[mode] * 1e6:8.1f} us/request "
+            f"overhead {(best[mode] - best['off']) * 1e6:6.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark FastJsonFormatter against JsonFormatter in records per second.
+
+Usage:
+    python -m bench.log_formatter --number 50000
+"""
+
+import argparse
+import logging
+import time
+from typing import Dict, List
+
+from amd.util.log import FastJsonFormatter, JsonFormatter
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional. The orjson case is skipped without it.
+    orjson = None
+
+
+def make_records(number: int) -> Dict[str, List[logging.LogRecord]]:
+    """Make log records with typical messages from a few call sites.
+
+    :param number: The number of records of each kind.
+
+    :return: A dict of record kinds to lists of records.
+    """
+    payload = {"user": 123, "path": "/api/items", "status": 200, "ms": 12.5}
+    return {
+        kind: [
+            logging.LogRecord(
+                "bench",
+                logging.INFO,
+                "/app/api.py",
+                10 + i % 5,
+                msg,
+                args,
+                None,
+            )
+            for i in range(number)
+        ]
+        for kind, msg, args in (
+            ("str", "GET %s %d", ("/api/items", 200)),
+            ("dict", payload, ()),
+        )
+    }
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=50000)
+    args = parser.parse_args()
+
+    formatters = {
+        "JsonFormatter": JsonFormatter(),
+        "FastJsonFormatter": FastJsonFormatter(),
+    }
+    if orjson is not None:
+        formatters["FastJsonFormatter(orjson)"] = FastJsonFormatter(
+            use_orjson=True
+        )
+
+    for kind, records in make_records(args.number).items():
+        baseline = None
+        for name, formatter in formatters.items():
+            start = time.perf_counter()
+            for record in records:
+                formatter.format(record)
+            rate = len(records) / (time.perf_counter() - start)
+            baseline = baseline or rate
+            print(
+                f"{kind:<4} {name:<26} {rate:9.0f} rec/s "
+                f"{rate / baseline:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark logging throughput and request latency under heavy logging.
+
+Compares the synchronous configure setup with configure_production for the
+block and drop queue policies.
+
+Usage:
+    python -m bench.log_pipeline --threads 8 --requests 2000 --records 5
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import List
+
+from amd.util.log import configure, configure_production
+
+
+def run_requests(
+    logger: logging.Logger, requests: int, records: int, latencies: List[float]
+) -> None:
+    """Simulate requests which each log several records.
+
+    :param logger: The logger to use.
+    :param requests: The number of requests to simulate.
+    :param records: The number of records logged per request.
+    :param latencies: A list to append each request latency to.
+    """
+    payload = {"user": 123, "path": "/api/items", "items": list(range(20))}
+    for i in range(requests):
+        start = time.perf_counter()
+        for j in range(records):
+            logger.info({"request": i, "record": j, "payload": payload})
+        latencies.append(time.perf_counter() - start)
+
+
+def reset_root_logger() -> None:
+    """Remove and close all handlers on the root logger."""
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+        handler.close()
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--records", type=int, default=5)
+    args = parser.parse_args()
+
+    logger = logging.getLogger("bench")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in ("sync", "block", "drop"):
+            file_path = os.path.join(tmp_dir, "%s.log" % mode)
+            reset_root_logger()
+            listener = None
+            if mode == "sync":
+                configure(file_level=logging.INFO, file_path=file_path)
+            else:
+                listener = configure_production(
+                    file_path, queue_policy=mode, queue_timeout=None
+                )
+
+            latencies: List[float] = []
+            threads = [
+                threading.Thread(
+                    target=run_requests,
+                    args=(logger, args.requests, args.records, latencies),
+                )
+                for _ in range(args.threads)
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            logged = time.perf_counter() - start
+            dropped = sum(
+                getattr(i, "dropped", 0) for i in logging.getLogger().handlers
+            )
+            if listener is not None:
+                listener.stop()
+            reset_root_logger()
+            written = time.perf_counter() - start
+
+            attempted = args.threads * args.requests * args.records
+            with open(file_path, "rb") as inf:
+                lines = sum(1 for _ in inf)
+            latencies.sort()
+            p99 = latencies[int(len(latencies) * 0.99)]
+            print(
+                f"{mode:<5} logged {attempted / logged:9.0f} rec/s "
+                f"written {lines / written:9.0f} rec/s "
+                f"p99 {p99 * 1e3:7.3f} ms dropped {dropped}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark to_dict against the serialize-first implementation it replaced.
+
+Usage:
+    python -m bench.object_to_dict --depth 4 --width 5
+"""
+
+import argparse
+import time
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Any
+
+import pytz
+
+from amd.util import json
+from amd.util.object import TIME_TYPES, to_dict
+
+
+def legacy_to_dict(obj: Any) -> Any:
+    """Convert an object to a dict by serializing it first at every level.
+
+    :param obj: The object to convert.
+
+    :return: The dict equivalent of the object.
+    """
+    try:
+        return json.loads(json.dumps(obj))
+    except (TypeError, ValueError):
+        pass
+
+    if isinstance(obj, TIME_TYPES) or isinstance(obj, str):
+        return obj
+    if isinstance(obj, dict):
+        return {k: legacy_to_dict(v) for k, v in obj.items()}
+    if isinstance(obj, Iterable):
+        return [legacy_to_dict(i) for i in obj]
+    return obj
+
+
+def make_payload(depth: int, width: int) -> Any:
+    """Make a nested payload with a non-string key at every level.
+
+    Non-string keys make the serialize-first approach fail at every level, as
+    nested objects do.
+
+    :param depth: The number of nested levels.
+    :param width: The number of children per level.
+
+    :return: The payload.
+    """
+    if depth == 0:
+        return {"name": "leaf", "at": datetime(2020, 1, 2, tzinfo=pytz.UTC)}
+
+    return {(i, "key"): make_payload(depth - 1, width) for i in range(width)}
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--width", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = make_payload(args.depth, args.width)
+    for name, func in (("legacy", legacy_to_dict), ("to_dict", to_dict)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            func(payload)
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:<8} {best * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
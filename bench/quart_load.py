@@ -0,0 +1,187 @@
+"""Benchmark the async request path against the sync Flask path.
+
+Each endpoint validates and loads the body, waits for simulated I/O, and sends
+the body back. The sync app handles requests one at a time, as a single worker
+does. The async app handles a number of requests concurrently.
+
+Usage:
+    python -m bench.quart_load --requests 500 --concurrency 50 --io-ms 5
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from flask import Flask
+from quart import Quart
+
+from amd.util import flask as sync_util
+from amd.util import json
+from amd.util import quart as async_util
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "request_body": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "at": {"type": "datetime"},
+                        },
+                    },
+                }
+            },
+        }
+    },
+}
+"""The schema used to validate the benchmark requests."""
+
+
+def make_body(records: int) -> str:
+    """Make a request body.
+
+    :param records: The number of records in the body.
+
+    :return: The JSON request body.
+    """
+    return json.dumps(
+        {
+            "items": [
+                {"name": "item %d" % i, "at": "2020-01-02T03:04:05Z"}
+                for i in range(records)
+            ]
+        }
+    )
+
+
+def make_async_app(io_seconds: float) -> Quart:
+    """Make a Quart app with the async helpers.
+
+    :param io_seconds: The simulated I/O time per request.
+
+    :return: A Quart application.
+    """
+    app = Quart("async")
+    async_util.register_error_handlers(app)
+
+    @app.route("/items", methods=["POST"])
+    @async_util.validate(SCHEMA)
+    async def post_items():
+        body = await async_util.load_body()
+        await asyncio.sleep(io_seconds)
+        return await async_util.make_json_response(body["items"])
+
+    return app
+
+
+def make_sync_app(io_seconds: float) -> Flask:
+    """Make a Flask app with the sync helpers.
+
+    :param io_seconds: The simulated I/O time per request.
+
+    :return: A Flask application.
+    """
+    app = Flask("sync")
+    sync_util.register_error_handlers(app)
+
+    @app.route("/items", methods=["POST"])
+    @sync_util.validate(SCHEMA)
+    def post_items():
+        body = sync_util.load_body()
+        time.sleep(io_seconds)
+        return sync_util.make_json_response(body["items"])
+
+    return app
+
+
+def run_async(app: Quart, body: str, requests: int, concurrency: int) -> float:
+    """Send requests to the async app.
+
+    :param app: The Quart application.
+    :param body: The request body.
+    :param requests: The number of requests to send.
+    :param concurrency: The number of requests in flight at once.
+
+    :return: The requests per second.
+    """
+
+    async def send(client, semaphore):
+        async with semaphore:
+            response = await client.post("/items", data=body)
+            assert response.status_code == 200
+            await response.get_data()
+
+    async def send_all():
+        client = app.test_client()
+        semaphore = asyncio.Semaphore(concurrency)
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(send(client, semaphore) for _ in range(requests))
+        )
+        return requests / (time.perf_counter() - start)
+
+    return asyncio.run(send_all())
+
+
+def run_sync(app: Flask, body: str, requests: int) -> float:
+    """Send requests to the sync app.
+
+    :param app: The Flask application.
+    :param body: The request body.
+    :param requests: The number of requests to send.
+
+    :return: The requests per second.
+    """
+    client = app.test_client()
+    start = time.perf_counter()
+    for _ in range(requests):
+        assert client.post("/items", data=body).status_code == 200
+
+    return requests / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--io-ms", type=float, default=5.0)
+    parser.add_argument("--records", type=int, nargs="+", default=[1, 500])
+    args = parser.parse_args()
+
+    io_seconds = args.io_ms / 1000
+    sync_app = make_sync_app(io_seconds)
+    async_app = make_async_app(io_seconds)
+    executors = {
+        "async inline": None,
+        "async threads": ThreadPoolExecutor(4),
+        "async processes": ProcessPoolExecutor(4),
+    }
+
+    for records in args.records:
+        body = make_body(records)
+        print(f"{records} records, {len(body)} bytes")
+        rate = run_sync(sync_app, body, args.requests)
+        print(f"  {'sync':<16} {rate:9.1f} requests/s")
+        for name, executor in executors.items():
+            if executor is None:
+                async_util.configure_offload(min_bytes=2**63, min_items=2**63)
+            else:
+                async_util.configure_offload(executor, 8192, 64)
+            rate = run_async(async_app, body, args.requests, args.concurrency)
+            print(f"  {name:<16} {rate:9.1f} requests/s")
+
+    async_util.configure_offload()
+    for executor in executors.values():
+        if executor is not None:
+            executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark key conversion of large payloads with repeated keys.
+
+Compares a naive recursive conversion with the unmemoized functions against
+keys_to_snake, with and without copying.
+
+Usage:
+    python -m bench.string_keys --records 10000
+"""
+
+import argparse
+import copy
+import time
+from typing import Any, Callable, Dict, List
+
+from amd.util.string import (
+    ALL_CAPS_REGEX,
+    FIRST_CAP_REGEX,
+    keys_to_snake,
+)
+
+
+def naive_camel_to_snake(string: str) -> str:
+    """Convert a camel case string to snake case without memoization.
+
+    :param string: A camel case string.
+
+    :return: A snake case string.
+    """
+    partial_snake_case = FIRST_CAP_REGEX.sub(r"\1_\2", string)
+
+    return ALL_CAPS_REGEX.sub(r"\1_\2", partial_snake_case).lower()
+
+
+def naive_keys_to_snake(obj: Any) -> Any:
+    """Recursively convert keys with a conversion per key occurrence.
+
+    :param obj: The object to convert.
+
+    :return: The converted object.
+    """
+    if isinstance(obj, dict):
+        return {
+            naive_camel_to_snake(k): naive_keys_to_snake(v)
+            for k, v in obj.items()
+        }
+    if isinstance(obj, list):
+        return [naive_keys_to_snake(i) for i in obj]
+    return obj
+
+
+def make_payload(records: int) -> List[Dict[str, Any]]:
+    """Make a list of records which share their keys.
+
+    :param records: The number of records.
+
+    :return: The payload.
+    """
+    return [
+        {
+            "itemId": i,
+            "displayName": "item %d" % i,
+            "createdAt": "2020-01-02T03:04:05Z",
+            "ownerInfo": {"userId": i, "emailAddress": "a@b.c", "isAdmin": 0},
+            "tagList": [{"tagName": "a"}, {"tagName": "b"}],
+        }
+        for i in range(records)
+    ]
+
+
+def measure(func: Callable[[Any], Any], payload: Any, repeat: int) -> float:
+    """Measure the best time of a conversion on fresh copies of a payload.
+
+    :param func: The conversion function.
+    :param payload: The payload to convert.
+    :param repeat: The number of times to measure.
+
+    :return: The best time in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        obj = copy.deepcopy(payload)
+        start = time.perf_counter()
+        func(obj)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = make_payload(args.records)
+    cases = (
+        ("naive", naive_keys_to_snake),
+        ("copy", keys_to_snake),
+        ("inplace", lambda obj: keys_to_snake(obj, inplace=True)),
+    )
+    for name, func in cases:
+        seconds = measure(func, payload, args.repeat)
+        print(f"{name:<8} {seconds * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""Benchmark the amd.util hot paths and fail on regressions.
+
+Each case is timed on synthetic payloads of a configurable size and depth. The
+best throughput of several repeats and the peak memory allocated by one call
+are recorded. Results can be saved as a JSON baseline and compared later. The
+comparison exits with status 1 when a case regresses beyond a threshold.
+
+Baselines are only comparable on the same machine with the same size and depth.
+
+Usage:
+    python -m bench.suite --size 100 --depth 3
+    python -m bench.suite --save baseline.json
+    python -m bench.suite --compare baseline.json --threshold 0.2
+"""
+
+import argparse
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from flask import Flask
+
+from amd.util import dict as dict_util
+from amd.util import json
+from amd.util.datetime import make_aware
+from amd.util.flask import load_body, make_json_response, validate
+from amd.util.jsonschema import make_strict
+from amd.util.jsonschema import validate as validate_schema
+
+
+def make_record(index: int, depth: int) -> Dict[str, Any]:
+    """Make a record with scalar, date, list, and nested dict values.
+
+    :param index: The index of the record, used to vary its values.
+    :param depth: The number of nested dict levels.
+
+    :return: The record.
+    """
+    record = {
+        "id": index,
+        "name": "record %d" % index,
+        "score": index / 7,
+        "active": index % 2 == 0,
+        "group": "group %d" % (index % 10),
+        "created": datetime(2020, 1, 1) + timedelta(minutes=index),
+        "tags": ["tag %d" % (index % 3), "tag %d" % (index % 5)],
+    }
+    if depth > 0:
+        record["child"] = make_record(index, depth - 1)
+
+    return record
+
+
+def make_payload(size: int, depth: int) -> List[Dict[str, Any]]:
+    """Make a list of records.
+
+    :param size: The number of records.
+    :param depth: The number of nested dict levels in each record.
+
+    :return: The payload.
+    """
+    return [make_record(i, depth) for i in range(size)]
+
+
+def make_schema(depth: int) -> Dict[str, Any]:
+    """Make a custom JSON Schema for a record.
+
+    :param depth: The number of nested dict levels.
+
+    :return: The schema.
+    """
+    schema = {
+        "type": "object",
+        "properties": {
+            "id": {"type": "integer"},
+            "name": {"type": "string"},
+            "score": {"type": "number"},
+            "active": {"type": "boolean"},
+            "group": {"type": "string"},
+            "created": {"type": "datetime"},
+            "tags": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["id", "name"],
+    }
+    if depth > 0:
+        schema["properties"]["child"] = make_schema(depth - 1)
+
+    return schema
+
+
+def make_cases(size: int, depth: int) -> Dict[str, Callable[[], Any]]:
+    """Make the benchmark cases.
+
+    :param size: The number of records in each payload.
+    :param depth: The number of nested dict levels in each record.
+
+    :return: Functions to benchmark by case name.
+    """
+    payload = make_payload(size, depth)
+    aware_payload = make_aware(payload)
+    text = json.dumps(payload)
+    schema = {"type": "array", "items": make_schema(depth)}
+    strict_schema = make_strict(schema)
+    instance = json.loads(json.dumps(payload))
+    for i in instance:
+        i["created"] = i["created"].isoformat()
+    shifted = make_payload(size, depth)[size // 2 :] + make_payload(
+        size // 2, depth
+    )
+    wrapper = {"records": payload}
+    other = {"records": shifted}
+    query = {"group": "group 1", "active": False}
+
+    app = Flask("bench")
+
+    @app.route("/records", methods=["POST"])
+    @validate({"type": "object", "properties": {"request_body": schema}})
+    def post_records():
+        return make_json_response(load_body())
+
+    client = app.test_client()
+
+    def request():
+        response = client.post("/records", data=text)
+        assert response.status_code == 200, response.data
+
+    return {
+        "json.dumps": lambda: json.dumps(payload),
+        "json.loads": lambda: json.loads(text),
+        "json.readable": lambda: json.readable(payload),
+        "jsonschema.make_strict": lambda: make_strict(schema),
+        "jsonschema.validate": lambda: validate_schema(instance, strict_schema),
+        "dict.find": lambda: dict_util.find(payload, query),
+        "dict.match": lambda: [dict_util.match(i, query) for i in payload],
+        "dict.project": lambda: [
+            dict_util.project(i, ["id", "child.*", "tags.*"]) for i in payload
+        ],
+        "dict.diff": lambda: dict_util.diff(wrapper, other),
+        "dict.unique": lambda: dict_util.unique(payload + shifted),
+        "datetime.make_aware": lambda: make_aware(payload),
+        "datetime.make_aware_noop": lambda: make_aware(aware_payload),
+        "flask.request": request,
+    }
+
+
+def measure(
+    func: Callable[[], Any], min_time: float, repeat: int
+) -> Dict[str, float]:
+    """Measure the throughput and peak memory of a function.
+
+    :param func: The function to measure.
+    :param min_time: The minimum number of seconds per repeat.
+    :param repeat: The number of repeats. The best one is used.
+
+    :return: The calls per second and the peak bytes allocated by one call.
+    """
+    # Calibrate the number of calls per repeat.
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        calls = (
+            max(calls * 2, int(calls * min_time / elapsed) + 1)
+            if elapsed > 0
+            else calls * 2
+        )
+
+    best = elapsed / calls
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter() - start) / calls)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"ops_per_second": 1 / best, "peak_bytes": peak}
+
+
+def compare(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float,
+    memory_threshold: float,
+) -> List[str]:
+    """Compare results with a baseline.
+
+    :param results: The current results.
+    :param baseline: The baseline results.
+    :param threshold: The allowed fractional drop in throughput.
+    :param memory_threshold: The allowed fractional increase in peak memory.
+
+    :return: A description of each regression.
+    """
+    for key in ("size", "depth"):
+        if results[key] != baseline[key]:
+            raise ValueError(
+                "The baseline %s is %s, not %s"
+                % (key, baseline[key], results[key])
+            )
+
+    regressions = []
+    for name, current in results["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+
+        ratio = current["ops_per_second"] / base["ops_per_second"]
+        if ratio < 1 - threshold:
+            regressions.append(
+                "%s: throughput %.0f%% of baseline" % (name, ratio * 100)
+            )
+        memory_ratio = current["peak_bytes"] / max(base["peak_bytes"], 1)
+        if memory_ratio > 1 + memory_threshold:
+            regressions.append(
+                "%s: peak memory %.0f%% of baseline"
+                % (name, memory_ratio * 100)
+            )
+
+    return regressions
+
+
+def main() -> None:
+    """Run the benchmarks, print the results, and save or compare them."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cases", nargs="*", help="Case name prefixes.")
+    parser.add_argument("--save", help="Save the results to this file.")
+    parser.add_argument("--compare", help="Compare with this baseline file.")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--memory-threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    cases = make_cases(args.size, args.depth)
+    if args.cases:
+        cases = {
+            k: v
+            for k, v in cases.items()
+            if any(k.startswith(i) for i in args.cases)
+        }
+
+    results = {
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "size": args.size,
+        "depth": args.depth,
+        "cases": {},
+    }
+    for name, func in cases.items():
+        result = results["cases"][name] = measure(
+            func, args.min_time, args.repeat
+        )
+        print(
+            f"{name:<26} {result['ops_per_second']:12.1f} ops/s "
+            f"{result['peak_bytes'] / 1024:10.1f} KiB peak"
+        )
+
+    if args.save:
+        with open(args.save, "w") as outf:
+            outf.write(json.readable(results))
+
+    if args.compare:
+        with open(args.compare) as inf:
+            baseline = json.loads(inf.read())
+        regressions = compare(
+            results, baseline, args.threshold, args.memory_threshold
+        )
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
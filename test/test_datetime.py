@@ -0,0 +1,254 @@
+"""Test functions for the datetime module."""
+
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+import pytz
+
+from amd.util.datetime import (
+    format_iso8601,
+    format_timestamp,
+    make_aware,
+    make_aware_many,
+    make_naive,
+    make_naive_many,
+    parse_iso8601,
+    utcnow,
+)
+
+NEW_YORK = pytz.timezone("America/New_York")
+
+DATETIMES = [
+    datetime(2020, 3, 8, 1, 30),
+    datetime(2020, 3, 8, 3, 30),
+    datetime(2020, 11, 1, 1, 30),
+    datetime(2020, 11, 1, 2, 30),
+]
+
+
+class TestMakeAware:
+    """Test the make_aware function."""
+
+    @staticmethod
+    def test_copy():
+        """Test that containers are copied by default."""
+        obj = {"a": [DATETIMES[0]]}
+        assert make_aware(obj) == {"a": [pytz.UTC.localize(DATETIMES[0])]}
+        assert obj == {"a": [DATETIMES[0]]}
+
+    @staticmethod
+    def test_inplace():
+        """Test that dicts and lists are mutated in place."""
+        lst = [DATETIMES[0]]
+        obj = {"a": lst, "b": (DATETIMES[1],)}
+        assert make_aware(obj, inplace=True) is obj
+        assert obj["a"] is lst
+        assert obj == {
+            "a": [pytz.UTC.localize(DATETIMES[0])],
+            "b": (pytz.UTC.localize(DATETIMES[1]),),
+        }
+
+    @staticmethod
+    def test_identity():
+        """Test that objects without naive datetimes are not copied."""
+        aware = pytz.UTC.localize(DATETIMES[0])
+        unchanged = {"a": [1, "b", aware], "c": {"d": (None, 2.5)}}
+        obj = {"unchanged": unchanged, "changed": [unchanged, DATETIMES[0]]}
+        new_obj = make_aware(obj)
+        assert make_aware(unchanged) is unchanged
+        assert new_obj is not obj
+        assert new_obj["unchanged"] is unchanged
+        assert new_obj["changed"][0] is unchanged
+        assert obj["changed"][1] is DATETIMES[0]
+
+    @staticmethod
+    def test_types():
+        """Test that container types are preserved."""
+        point = namedtuple("Point", ["x", "y"])
+        obj = [
+            (DATETIMES[0],),
+            {DATETIMES[0]},
+            frozenset([DATETIMES[0]]),
+            point(DATETIMES[0], 1),
+            b"bytes",
+        ]
+        aware = pytz.UTC.localize(DATETIMES[0])
+        assert make_aware(obj) == [
+            (aware,),
+            {aware},
+            frozenset([aware]),
+            point(aware, 1),
+            b"bytes",
+        ]
+        assert isinstance(make_aware(obj)[3], point)
+
+    @staticmethod
+    def test_str_subclass():
+        """Test that subclasses of strings are not split into characters."""
+
+        class Title(str):
+            """A string subclass like markupsafe.Markup."""
+
+        obj = {"title": Title("Café €5")}
+        assert make_aware(obj) is obj
+
+    @staticmethod
+    def test_ndarray():
+        """Test that NumPy arrays are returned as is."""
+        numpy = pytest.importorskip("numpy")
+        obj = {"a": numpy.arange(3.0)}
+        assert make_aware(obj) is obj
+
+    @staticmethod
+    def test_unsupported_iterable():
+        """Test that iterables which would be consumed are rejected."""
+        with pytest.raises(TypeError):
+            make_aware({"a": (i for i in DATETIMES)})
+
+
+class TestMakeNaive:
+    """Test the make_naive function."""
+
+    @staticmethod
+    def test_inplace():
+        """Test that dicts and lists are mutated in place."""
+        obj = {"a": [pytz.UTC.localize(DATETIMES[0])]}
+        assert make_naive(obj, inplace=True) is obj
+        assert obj == {"a": [DATETIMES[0]]}
+
+
+class TestMakeAwareMany:
+    """Test the make_aware_many function."""
+
+    @staticmethod
+    @pytest.mark.parametrize("tzinfo", [pytz.UTC, NEW_YORK])
+    def test_sequence(tzinfo):
+        """Test localizing a sequence of datetimes."""
+        aware = pytz.UTC.localize(DATETIMES[0])
+        assert make_aware_many(DATETIMES + [aware], tzinfo) == [
+            tzinfo.localize(i) for i in DATETIMES
+        ] + [aware]
+
+    @staticmethod
+    @pytest.mark.parametrize("tzinfo", [pytz.UTC, NEW_YORK])
+    def test_datetime64(tzinfo):
+        """Test converting a datetime64 array of wall times to UTC."""
+        numpy = pytest.importorskip("numpy")
+        arr = numpy.array(DATETIMES, dtype="datetime64[us]")
+        assert make_aware_many(arr, tzinfo).tolist() == [
+            tzinfo.localize(i).astimezone(pytz.UTC).replace(tzinfo=None)
+            for i in DATETIMES
+        ]
+
+    @staticmethod
+    def test_negative_dst():
+        """Test that repeated and skipped wall times match localize."""
+        numpy = pytest.importorskip("numpy")
+        dublin = pytz.timezone("Europe/Dublin")
+        datetimes = [
+            start + timedelta(minutes=30 * i)
+            for start in (datetime(1971, 10, 30), datetime(2020, 3, 28))
+            for i in range(24 * 2 * 3)
+        ] + [datetime(2020, 10, 25, 1, 30)]
+        expected = [dublin.localize(i) for i in datetimes]
+
+        assert [(i, i.tzinfo) for i in make_aware_many(datetimes, dublin)] == [
+            (i, i.tzinfo) for i in expected
+        ]
+        arr = numpy.array(datetimes, dtype="datetime64[us]")
+        assert make_aware_many(arr, dublin).tolist() == [
+            i.astimezone(pytz.UTC).replace(tzinfo=None) for i in expected
+        ]
+
+
+class TestMakeNaiveMany:
+    """Test the make_naive_many function."""
+
+    @staticmethod
+    def test_sequence():
+        """Test removing and converting timezones of a sequence."""
+        aware = [NEW_YORK.localize(i) for i in DATETIMES]
+        assert make_naive_many(aware) == DATETIMES
+        assert make_naive_many(aware, pytz.UTC) == [
+            i.astimezone(pytz.UTC).replace(tzinfo=None) for i in aware
+        ]
+
+    @staticmethod
+    def test_datetime64():
+        """Test converting a datetime64 array of UTC times to wall times."""
+        numpy = pytest.importorskip("numpy")
+        arr = numpy.array(DATETIMES, dtype="datetime64[us]")
+        assert make_naive_many(arr) is arr
+        assert make_naive_many(arr, NEW_YORK).tolist() == [
+            pytz.UTC.localize(i).astimezone(NEW_YORK).replace(tzinfo=None)
+            for i in DATETIMES
+        ]
+
+
+class TestFormatIso8601:
+    """Test the format_iso8601 function."""
+
+    @staticmethod
+    @pytest.mark.parametrize("tzinfo", [None, pytz.UTC, NEW_YORK])
+    def test_matches_isoformat(tzinfo):
+        """Test that the output matches datetime.isoformat."""
+        for dtm in DATETIMES + [datetime(2020, 1, 1, 0, 0, 0, 120)]:
+            if tzinfo is not None:
+                dtm = tzinfo.localize(dtm)
+            assert format_iso8601(dtm) == dtm.isoformat()
+
+
+class TestFormatTimestamp:
+    """Test the format_timestamp function."""
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        "timestamp", [0, 1583634600.5, 1583634600.9999996, -1.25]
+    )
+    def test_matches_isoformat(timestamp):
+        """Test that the output matches datetime.isoformat."""
+        assert (
+            format_timestamp(timestamp)
+            == datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+        )
+
+
+class TestParseIso8601:
+    """Test the parse_iso8601 function."""
+
+    @staticmethod
+    def test_date():
+        """Test parsing a date."""
+        assert parse_iso8601("2020-03-08") == date(2020, 3, 8)
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        "value",
+        [
+            "2020-03-08T01:30:00Z",
+            "2020-03-08T01:30:00.000+00:00",
+            "2020-03-07T20:30:00.0000001-05:00",
+        ],
+    )
+    def test_datetime(value):
+        """Test parsing datetimes with offsets and fractional seconds."""
+        assert parse_iso8601(value) == pytz.UTC.localize(DATETIMES[0])
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        "value",
+        ["", "hello", "2020-13-08", "2020-03-08 01:30:00", "2020-03-08T01:30"],
+    )
+    def test_invalid(value):
+        """Test that other strings are not parsed."""
+        assert parse_iso8601(value) is None
+
+
+class TestUtcnow:
+    """Test the utcnow function."""
+
+    @staticmethod
+    def test_utc():
+        """Test that the datetime is localized to pytz UTC."""
+        assert utcnow().tzinfo is pytz.UTC
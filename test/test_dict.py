@@ -0,0 +1,178 @@
+"""Test functions for the dict module."""
+
+import base64
+import json
+
+import pytest
+
+from amd.util.dict import IndexedCollection, match, query
+
+RECORDS = [
+    {"name": "a", "meta": {"color": "red", "size": 1}, "tags": ["x"]},
+    {"name": "b", "meta": {"color": "blue", "size": 1}, "tags": ["y"]},
+    {"name": "c", "meta": {"color": "red", "size": 2}, "tags": ["x", "y"]},
+    {"name": "d", "meta": {"color": "green", "size": 3}},
+]
+
+QUERIES = [
+    {},
+    {"meta": {"color": "red"}},
+    {"meta.color": "red", "meta.size": 2},
+    {"meta": {"color": "red"}, "tags": ["x"]},
+    {"name": "b", "meta.color": "green"},
+    {"name": "z"},
+]
+
+QUERY_RECORDS = [
+    {"id": i, "group": i % 3, "info": {"rank": (i * 7) % 10}} for i in range(20)
+] + [{"id": 20, "group": 0}]
+
+
+class TestIndexedCollection:
+    """Test the IndexedCollection class."""
+
+    @staticmethod
+    @pytest.mark.parametrize("qtype", ["all", "any", "none"])
+    @pytest.mark.parametrize("qry", QUERIES)
+    def test_find_matches_scan(qry, qtype):
+        """Test that indexed queries return the same records as a scan."""
+        expected = [i for i in RECORDS if match(i, qry, qtype)]
+        for indexes in ((), ("meta.color",), ("name", "meta.size", "tags.0")):
+            collection = IndexedCollection(RECORDS, indexes=indexes)
+            assert collection.find(qry, qtype) == expected
+
+    @staticmethod
+    def test_unhashable_values():
+        """Test that records with empty lists can be indexed and queried."""
+        records = [{"name": "e", "tags": []}, {"name": "f", "tags": ["x"]}]
+        collection = IndexedCollection(records, indexes=["tags"])
+        assert collection.find({"name": "e"}) == [records[0]]
+        collection.delete(0)
+        assert collection.find({"tags": ["x"]}) == [records[1]]
+
+    @staticmethod
+    def test_update_and_delete():
+        """Test that updating and deleting records maintains the indexes."""
+        collection = IndexedCollection(indexes=["meta.color"])
+        keys = [collection.insert(i) for i in RECORDS]
+        collection.update(keys[0], {"name": "a", "meta": {"color": "blue"}})
+        collection.delete(keys[1])
+
+        assert len(collection) == 3
+        assert keys[1] not in collection
+        assert collection.find({"meta.color": "blue"}) == [
+            collection.get(keys[0])
+        ]
+        assert collection.find({"meta.color": "red"}) == [RECORDS[2]]
+
+    @staticmethod
+    @pytest.mark.parametrize("qtype", ["all", "any", "none"])
+    def test_update_order(qtype):
+        """Test that updated records keep their order in every query type."""
+        collection = IndexedCollection([{"a": 1}, {"a": 3}, {"a": 5}])
+        collection.update(0, {"a": 3})
+        qry = {"a": 1} if qtype == "none" else {"a": 3}
+        assert collection.find({}, "all") == [{"a": 3}, {"a": 3}, {"a": 5}]
+        assert collection.find(qry, qtype)[0] is collection.get(0)
+
+    @staticmethod
+    def test_add_index():
+        """Test adding an index to a collection with existing records."""
+        collection = IndexedCollection(RECORDS)
+        collection.add_index("meta.size")
+        assert collection.indexes == ["meta.size"]
+        assert collection.find({"meta.size": 1}, "none") == RECORDS[2:]
+
+    @staticmethod
+    def test_invalid_query_type():
+        """Test that an invalid query type raises an error."""
+        with pytest.raises(ValueError):
+            IndexedCollection(RECORDS).find({"name": "a"}, "some")
+
+
+class TestQuery:
+    """Test the query function."""
+
+    @staticmethod
+    @pytest.mark.parametrize("qtype", ["all", "any", "none"])
+    @pytest.mark.parametrize("qry", QUERIES)
+    def test_filter_matches(qry, qtype):
+        """Test that the filter has the same results as match."""
+        records, cursor = query(RECORDS, filter_=qry, qtype=qtype)
+        assert records == [i for i in RECORDS if match(i, qry, qtype)]
+        assert cursor is None
+
+    @staticmethod
+    def test_limit():
+        """Test that records are limited in input order across pages."""
+        records, cursor = query(QUERY_RECORDS, filter_={"group": 1}, limit=3)
+        assert [i["id"] for i in records] == [1, 4, 7]
+
+        records, cursor = query(
+            QUERY_RECORDS, filter_={"group": 1}, limit=3, cursor=cursor
+        )
+        assert [i["id"] for i in records] == [10, 13, 16]
+        records, cursor = query(
+            QUERY_RECORDS, filter_={"group": 1}, limit=3, cursor=cursor
+        )
+        assert [i["id"] for i in records] == [19]
+        assert cursor is None
+
+    @staticmethod
+    def test_sort():
+        """Test multi-key sorting with descending fields and missing values."""
+        expected = sorted(
+            QUERY_RECORDS,
+            key=lambda i: (-i["group"], i.get("info", {}).get("rank", 99)),
+        )
+        records, _ = query(QUERY_RECORDS, sort=["-group", "info.rank"])
+        assert records == expected
+
+        pages = []
+        cursor = None
+        while True:
+            records, cursor = query(
+                iter(QUERY_RECORDS),
+                sort=["-group", "info.rank"],
+                limit=4,
+                cursor=cursor,
+            )
+            pages.extend(records)
+            if cursor is None:
+                break
+        assert pages == expected
+
+    @staticmethod
+    def test_invalid_cursor():
+        """Test that a cursor can't be used with another sort."""
+        _, cursor = query(QUERY_RECORDS, sort=["id"], limit=1)
+        with pytest.raises(ValueError):
+            query(QUERY_RECORDS, sort=["-id"], cursor=cursor)
+        with pytest.raises(ValueError):
+            query(QUERY_RECORDS, sort=["id"], cursor="not a cursor")
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        "data",
+        [
+            [["id"], 5, 0],
+            [["id"], [5], 0],
+            [["id"], [[0, 1, 2]], 0],
+            [["id"], [[0, 1]], "0"],
+            [["id"], [[0, "1"]], 0],
+        ],
+    )
+    def test_tampered_cursor(data):
+        """Test that a cursor with an invalid key raises a ValueError."""
+        cursor = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+        with pytest.raises(ValueError):
+            query(QUERY_RECORDS, sort=["id"], limit=1, cursor=cursor)
+
+    @staticmethod
+    @pytest.mark.parametrize("limit", [None, 1])
+    @pytest.mark.parametrize("values", [[1, "a"], [{"a": 1}, {"a": 2}]])
+    def test_unorderable(values, limit):
+        """Test that sorting values which can't be ordered raises ValueError."""
+        records = [{"v": i} for i in values]
+        with pytest.raises(ValueError):
+            query(records, sort=["v"], limit=limit)
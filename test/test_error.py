@@ -0,0 +1,74 @@
+"""Test functions for the error module."""
+
+import sys
+
+from amd.util.error import ExceptionCapture, info
+
+
+def _raise(depth):
+    """Raise a ValueError from a number of nested calls."""
+    if depth:
+        _raise(depth - 1)
+    raise ValueError("bad value")
+
+
+def _exc_info(depth=0):
+    """Get the exception information of a raised ValueError."""
+    try:
+        _raise(depth)
+    except ValueError:
+        return sys.exc_info()
+
+
+class TestInfo:
+    """Test the info function."""
+
+    @staticmethod
+    def test_full():
+        """Test that the full traceback is formatted by default."""
+        try:
+            _raise(30)
+        except ValueError:
+            result = info()
+        assert "Previous line repeated" in "".join(result["traceback"])
+        assert result["value"] == "bad value"
+
+    @staticmethod
+    def test_capture():
+        """Test that a capture limits the number of frames."""
+        try:
+            _raise(30)
+        except ValueError:
+            result = info(ExceptionCapture(limit=5))
+        assert len(result["traceback"]) <= 5
+        assert "raise ValueError" in result["traceback"][-1]
+        assert result["count"] == 1
+
+
+class TestExceptionCapture:
+    """Test the ExceptionCapture class."""
+
+    @staticmethod
+    def test_dedupe():
+        """Test that repeats within the window are counted, not formatted."""
+        capture = ExceptionCapture(window=60.0)
+        first = capture.capture(_exc_info())
+        second = capture.capture(_exc_info(1))
+        assert first["fingerprint"] == second["fingerprint"]
+        assert first["fingerprint"].startswith("ValueError:")
+        assert second["count"] == 2
+        assert second["traceback"] is None
+
+        capture._windows[first["fingerprint"]][0] -= 60.0
+        third = capture.capture(_exc_info())
+        assert third["count"] == 1
+        assert third["traceback"] is first["traceback"]
+
+    @staticmethod
+    def test_no_window():
+        """Test that every capture has a traceback without a window."""
+        capture = ExceptionCapture(window=0, cache_size=1)
+        first = capture.capture(_exc_info())
+        second = capture.capture(_exc_info(1))
+        assert first["traceback"] and second["traceback"]
+        assert len(capture._tracebacks) == 1
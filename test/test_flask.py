@@ -0,0 +1,556 @@
+"""Test functions for the flask module."""
+
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import zlib
+from types import SimpleNamespace
+
+from flask import Blueprint, Flask, request
+from prometheus_client import REGISTRY, CollectorRegistry
+from prometheus_client.metrics_core import CounterMetricFamily
+from prometheus_client.mmap_dict import MmapedDict
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from amd.util.flask import (
+    _ARCHIVE_LOCK,
+    _LockedCollector,
+    CachedCollectorRegistry,
+    configure_body,
+    gunicorn_child_exit,
+    gunicorn_on_starting,
+    load_body,
+    make_json_response,
+    make_schema_response,
+    register_error_handlers,
+    register_openapi,
+    register_profiling,
+    register_timing,
+    validate,
+)
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "request_body": {
+            "type": "object",
+            "properties": {"at": {"type": "datetime"}},
+            "required": ["at"],
+        }
+    },
+}
+
+
+def _make_app(**kwargs):
+    """Make an app with a route that uses the request helpers."""
+    app = Flask(__name__)
+    register_error_handlers(app)
+    register_timing(app, **kwargs)
+
+    @app.route("/items", methods=["POST"])
+    @validate(SCHEMA)
+    def post_items():
+        return make_json_response(load_body())
+
+    return app
+
+
+def _write_counter(path, pid, value):
+    """Write a counter value as a Gunicorn worker would."""
+    key = json.dumps(("jobs", "jobs_total", {}, "Jobs."), sort_keys=True)
+    values = MmapedDict(os.path.join(path, "counter_%d.db" % pid))
+    values.write_value(key, value, 0.0)
+    values.close()
+    return key
+
+
+class _CountingCollector:
+    """A collector which counts how often it was collected."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def collect(self):
+        self.calls += 1
+        yield CounterMetricFamily("calls", "Calls.", value=self.calls)
+
+
+class TestCachedCollectorRegistry:
+    """Test the CachedCollectorRegistry class."""
+
+    @staticmethod
+    def test_collect():
+        """Test that metrics are cached until the TTL expires."""
+        registry = CachedCollectorRegistry(ttl=60.0)
+        collector = _CountingCollector()
+        registry.register(collector)
+
+        first = list(registry.collect())
+        assert list(registry.collect()) == first
+        assert collector.calls == 1
+
+        registry._cached_at -= 60.0
+        assert list(registry.collect()) == first
+        deadline = time.monotonic() + 5.0
+        while registry._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert collector.calls == 2
+        assert list(registry.collect()) != first
+
+
+class TestGunicornHooks:
+    """Test the Gunicorn server hooks."""
+
+    @staticmethod
+    def test_gunicorn_on_starting(tmp_path, monkeypatch):
+        """Test that stale files are removed."""
+        path = str(tmp_path / "metrics")
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", path)
+        gunicorn_on_starting(None)
+        _write_counter(path, 1, 1.0)
+        open(os.path.join(path, "notes.txt"), "w").close()
+
+        gunicorn_on_starting(None)
+        assert os.listdir(path) == ["notes.txt"]
+
+    @staticmethod
+    def test_gunicorn_child_exit(tmp_path, monkeypatch):
+        """Test that dead worker files are merged into the archive."""
+        path = str(tmp_path)
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", path)
+        key = _write_counter(path, 1, 2.0)
+        _write_counter(path, 2, 3.0)
+        open(os.path.join(path, "gauge_livesum_1.db"), "w").close()
+
+        gunicorn_child_exit(None, SimpleNamespace(pid=1))
+        gunicorn_child_exit(None, SimpleNamespace(pid=2))
+        assert os.listdir(path) == ["counter_archive.db"]
+
+        archive = MmapedDict(os.path.join(path, "counter_archive.db"))
+        assert archive.read_value(key) == (5.0, 0.0)
+        archive.close()
+
+    @staticmethod
+    def test_gunicorn_child_exit_gauges(tmp_path, monkeypatch):
+        """Test that gauges are merged by mode or removed."""
+        path = str(tmp_path)
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", path)
+        key = "key"
+        for pid, value in ((1, 2.0), (2, 3.0)):
+            for mode in ("all", "max", "min", "mostrecent", "sum"):
+                values = MmapedDict(
+                    os.path.join(path, "gauge_%s_%d.db" % (mode, pid))
+                )
+                values.write_value(key, value, float(pid))
+                values.close()
+
+        gunicorn_child_exit(None, SimpleNamespace(pid=1))
+        gunicorn_child_exit(None, SimpleNamespace(pid=2))
+        assert sorted(os.listdir(path)) == [
+            "gauge_%s_archive.db" % i
+            for i in ("max", "min", "mostrecent", "sum")
+        ]
+        for mode, expected in (
+            ("max", 3.0),
+            ("min", 2.0),
+            ("mostrecent", 3.0),
+            ("sum", 5.0),
+        ):
+            archive = MmapedDict(
+                os.path.join(path, "gauge_%s_archive.db" % mode)
+            )
+            assert archive.read_value(key)[0] == expected, mode
+            archive.close()
+
+    @staticmethod
+    def test_scrape_during_archive(tmp_path, monkeypatch):
+        """Test that metrics aren't collected while files are archived."""
+        path = str(tmp_path)
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", path)
+        _write_counter(path, 1, 2.0)
+        registry = CollectorRegistry()
+        registry.register(_LockedCollector(MultiProcessCollector(None, path)))
+        totals = []
+
+        def scrape():
+            totals.append(registry.get_sample_value("jobs_total"))
+
+        with _ARCHIVE_LOCK:
+            thread = threading.Thread(target=scrape)
+            thread.start()
+            thread.join(0.1)
+            assert thread.is_alive()
+        thread.join()
+        assert totals == [2.0]
+
+
+class TestSparseFieldsets:
+    """Test sparse fieldsets in make_json_response."""
+
+    @staticmethod
+    def _get(query, data):
+        """Send data through make_json_response and return the JSON body."""
+        app = Flask(__name__)
+
+        @app.route("/items")
+        def get_items():
+            return make_json_response(data, sparse=True)
+
+        return app.test_client().get("/items?" + query).json
+
+    def test_fields(self):
+        """Test that a generic fields parameter selects nested fields."""
+        data = [
+            {"id": 1, "name": "a", "owner": {"email": "a@b.c", "age": 3}},
+            {"id": 2, "owner": [{"email": "d@e.f", "age": 4}]},
+        ]
+        assert self._get("fields=id,owner.email,missing", data) == {
+            "data": [
+                {"id": 1, "owner": {"email": "a@b.c"}},
+                {"id": 2, "owner": [{"email": "d@e.f"}]},
+            ]
+        }
+        assert self._get("", data) == {"data": data}
+
+    @staticmethod
+    def test_opt_in():
+        """Test that fields are only applied to endpoints which opt in."""
+        app = Flask(__name__)
+
+        @app.route("/items")
+        def get_items():
+            return make_json_response([{"id": 1, "name": "a"}])
+
+        @app.route("/schema")
+        def get_schema():
+            return make_schema_response({"type": "object"})
+
+        client = app.test_client()
+        assert client.get("/items?fields=id").json == {
+            "data": [{"id": 1, "name": "a"}]
+        }
+        assert "type" in client.get("/schema?fields=id").json["data"]
+
+    def test_jsonapi_fields(self):
+        """Test that fields[TYPE] selects resource attributes by type."""
+        data = {
+            "data": {
+                "type": "articles",
+                "id": "1",
+                "attributes": {"title": "T", "body": "B"},
+                "relationships": {"author": {}, "tags": {}},
+            },
+            "included": [
+                {"type": "people", "id": "2", "attributes": {"name": "N"}}
+            ],
+        }
+        body = self._get("fields[articles]=title,author", data)
+        assert body["data"]["attributes"] == {"title": "T"}
+        assert body["data"]["relationships"] == {"author": {}}
+        assert body["included"] == data["included"]
+
+
+class TestLoadBody:
+    """Test the load_body function."""
+
+    @staticmethod
+    def test_compressed():
+        """Test that gzip and deflate bodies are decompressed once."""
+        client = _make_app().test_client()
+        body = b'{"at": "2020-01-02T03:04:05Z"}'
+        for encoding, data in (
+            ("gzip", gzip.compress(body)),
+            ("deflate", zlib.compress(body)),
+            ("identity", body),
+        ):
+            response = client.post(
+                "/items", data=data, headers={"Content-Encoding": encoding}
+            )
+            assert response.status_code == 200, encoding
+            assert response.json["data"]["at"].startswith("2020-01-02T03:04:05")
+
+    @staticmethod
+    def test_multiple_members():
+        """Test that every member of a multi-member gzip body is read."""
+        data = gzip.compress(b'{"at": ') + gzip.compress(
+            b'"2020-01-02T03:04:05Z"}'
+        )
+        response = (
+            _make_app()
+            .test_client()
+            .post("/items", data=data, headers={"Content-Encoding": "gzip"})
+        )
+        assert response.status_code == 200
+
+    @staticmethod
+    def test_get_data():
+        """Test that the raw body stays available to other code."""
+        app = Flask(__name__)
+        bodies = []
+
+        @app.before_request
+        def read_first():
+            bodies.append(request.get_data())
+
+        @app.route("/items", methods=["POST"])
+        def post_items():
+            body = load_body()
+            bodies.append(request.get_data())
+            return make_json_response(body)
+
+        response = app.test_client().post("/items", data='{"a": 1}')
+        assert response.status_code == 200
+        assert response.json == {"data": {"a": 1}}
+        assert bodies == [b'{"a": 1}', b'{"a": 1}']
+
+    @staticmethod
+    def test_invalid():
+        """Test that invalid and unsupported encodings are rejected."""
+        client = _make_app().test_client()
+        body = gzip.compress(b'{"at": "2020-01-02T03:04:05Z"}')
+        for data, encoding, status in (
+            (b"not gzip", "gzip", 400),
+            (body[:-10], "gzip", 400),
+            (body + b"garbage", "gzip", 400),
+            (zlib.compress(b"{}") + b"x", "deflate", 400),
+            (body, "compress", 415),
+        ):
+            response = client.post(
+                "/items", data=data, headers={"Content-Encoding": encoding}
+            )
+            assert response.status_code == status
+            assert response.json["errors"]
+
+    @staticmethod
+    def test_max_size():
+        """Test that bodies larger than the maximum size are rejected."""
+        client = _make_app().test_client()
+        bomb = gzip.compress(b" " * 10 * 1024 * 1024)
+        configure_body(max_size=1024 * 1024)
+        try:
+            response = client.post(
+                "/items", data=bomb, headers={"Content-Encoding": "gzip"}
+            )
+            assert response.status_code == 413
+            assert response.json["errors"]
+            response = client.post("/items", data=b" " * (1024 * 1024 + 1))
+            assert response.status_code == 413
+        finally:
+            configure_body()
+
+    @staticmethod
+    def test_max_size_chunked():
+        """Test that chunked bodies stop being read once they are too large."""
+        client = _make_app().test_client()
+        configure_body(max_size=1024)
+        try:
+            for data, encoding in (
+                (b" " * 10 * 1024 * 1024, "identity"),
+                (os.urandom(10 * 1024 * 1024), "gzip"),
+            ):
+                stream = io.BytesIO(data)
+                response = client.post(
+                    "/items",
+                    input_stream=stream,
+                    headers={
+                        "Content-Encoding": encoding,
+                        "Transfer-Encoding": "chunked",
+                    },
+                    environ_overrides={"wsgi.input_terminated": True},
+                )
+                assert response.status_code == 413, encoding
+                assert stream.tell() < 1024 * 1024, encoding
+
+            response = client.post(
+                "/items",
+                input_stream=io.BytesIO(b'{"at": "2020-01-02T03:04:05Z"}'),
+                headers={"Transfer-Encoding": "chunked"},
+                environ_overrides={"wsgi.input_terminated": True},
+            )
+            assert response.status_code == 200
+        finally:
+            configure_body()
+
+
+class TestRegisterOpenApi:
+    """Test the register_openapi function."""
+
+    @staticmethod
+    def test_blueprints(tmp_path):
+        """Test that each blueprint serves its own spec."""
+        app = Flask(__name__)
+        for name in ("one", "two"):
+            specfile = tmp_path / ("%s.json" % name)
+            specfile.write_text(json.dumps({"title": name}))
+            blueprint = Blueprint(name, __name__, url_prefix="/" + name)
+            register_openapi(blueprint, str(specfile))
+            app.register_blueprint(blueprint)
+
+        client = app.test_client()
+        assert client.get("/one/spec").json == {"title": "one"}
+        assert client.get("/two/spec").json == {"title": "two"}
+        assert b"/two/spec" in client.get("/two/").data
+
+    @staticmethod
+    def test_conditional(tmp_path):
+        """Test that responses are compressed and support revalidation."""
+        specfile = tmp_path / "spec.json"
+        specfile.write_text(json.dumps({"paths": ["/items"] * 100}))
+        app = Flask(__name__)
+        register_openapi(app, str(specfile))
+        client = app.test_client()
+
+        response = client.get("/spec", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.content_encoding == "gzip"
+        assert "Accept-Encoding" in response.vary
+        assert json.loads(gzip.decompress(response.data)) == {
+            "paths": ["/items"] * 100
+        }
+
+        response = client.get(
+            "/spec",
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": response.headers["ETag"],
+            },
+        )
+        assert response.status_code == 304
+        assert response.data == b""
+
+        response = client.get(
+            "/swagger",
+            headers={"If-Modified-Since": "Fri, 1 Jan 2100 00:00:00 GMT"},
+        )
+        assert response.status_code == 304
+
+    @staticmethod
+    def test_reload(tmp_path):
+        """Test that the spec is read again when it is modified."""
+        specfile = tmp_path / "spec.json"
+        specfile.write_text('{"version": 1}')
+        app = Flask(__name__)
+        register_openapi(app, str(specfile), reload=True)
+        client = app.test_client()
+        etag = client.get("/spec").headers["ETag"]
+
+        specfile.write_text('{"version": 2}')
+        os.utime(specfile, (0, 0))
+        response = client.get("/spec", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json == {"version": 2}
+
+
+class TestRegisterProfiling:
+    """Test the register_profiling function."""
+
+    @staticmethod
+    def test_histogram():
+        """Test that allocations are observed by endpoint, stage, and kind."""
+        name = "amd_flask_stage_allocated_bytes_count"
+        labels = [
+            {"endpoint": "post_items", "stage": stage, "kind": kind}
+            for stage in ("parse", "validate", "encode", "total")
+            for kind in ("peak", "net")
+        ]
+        before = [REGISTRY.get_sample_value(name, i) or 0 for i in labels]
+        app = _make_app()
+        register_profiling(app, sample_rate=1.0, threshold=None)
+        response = app.test_client().post(
+            "/items", data='{"at": "2020-01-02T03:04:05Z"}'
+        )
+
+        assert response.status_code == 200
+        assert [REGISTRY.get_sample_value(name, i) for i in labels] == [
+            i + 1 for i in before
+        ]
+        assert not tracemalloc.is_tracing()
+
+    @staticmethod
+    def test_concurrent():
+        """Test that tracing stops when the last sampled request finishes."""
+        apps = [_make_app(), _make_app()]
+        for app in apps:
+            register_profiling(app, sample_rate=1.0, threshold=None)
+
+        with apps[0].test_request_context("/items", method="POST"):
+            apps[0].preprocess_request()
+            with apps[1].test_request_context("/items", method="POST"):
+                apps[1].preprocess_request()
+            assert tracemalloc.is_tracing()
+        assert not tracemalloc.is_tracing()
+
+    @staticmethod
+    def test_sample_rate():
+        """Test that requests which aren't sampled aren't profiled."""
+        name = "amd_flask_stage_allocated_bytes_count"
+        labels = {"endpoint": "post_items", "stage": "total", "kind": "peak"}
+        before = REGISTRY.get_sample_value(name, labels)
+        app = _make_app()
+        register_profiling(app, sample_rate=0.0)
+        app.test_client().post("/items", data='{"at": 1}')
+
+        assert REGISTRY.get_sample_value(name, labels) == before
+
+    @staticmethod
+    def test_threshold(caplog):
+        """Test that the top allocation sites are logged once."""
+        app = _make_app()
+        register_profiling(app, sample_rate=1.0, threshold=0, top=3)
+        with caplog.at_level(logging.WARNING, "amd.util.flask"):
+            app.test_client().post(
+                "/items", data='{"at": "2020-01-02T03:04:05Z"}'
+            )
+
+        assert len(caplog.records) == 1
+        message = caplog.records[0].msg
+        assert message["type"] == "allocations"
+        assert message["endpoint"] == "post_items"
+        assert message["stage"] == "body"
+        assert 0 < len(message["sites"]) <= 3
+        assert all(i["traceback"] for i in message["sites"])
+
+
+class TestRegisterTiming:
+    """Test the register_timing function."""
+
+    @staticmethod
+    def test_server_timing():
+        """Test that stage durations are sent in a Server-Timing header."""
+        client = _make_app(server_timing=True).test_client()
+        response = client.post("/items", data='{"at": "2020-01-02T03:04:05Z"}')
+
+        assert response.status_code == 200
+        assert response.get_json() == {
+            "data": {"at": "2020-01-02T03:04:05+00:00"}
+        }
+        stages = [
+            i.split(";")[0]
+            for i in response.headers["Server-Timing"].split(", ")
+        ]
+        assert stages == [
+            "body",
+            "parse",
+            "strict",
+            "validate",
+            "encode",
+            "total",
+        ]
+
+    @staticmethod
+    def test_histogram():
+        """Test that stage durations are observed by endpoint."""
+        labels = {"endpoint": "post_items", "stage": "validate"}
+        name = "amd_flask_stage_duration_seconds_count"
+        before = REGISTRY.get_sample_value(name, labels) or 0
+        client = _make_app().test_client()
+        response = client.post("/items", data='{"at": 1}')
+
+        assert response.status_code == 400
+        assert "Server-Timing" not in response.headers
+        assert REGISTRY.get_sample_value(name, labels) == before + 1
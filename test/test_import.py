@@ -0,0 +1,88 @@
+"""Test the import time of the amd.util modules."""
+
+import subprocess
+import sys
+
+import pytest
+
+BUDGET_MICROSECONDS = 100000
+"""The maximum cumulative import time of a module without Flask."""
+
+HEAVY_MODULES = (
+    "flask",
+    "flatten_json",
+    "jsonschema",
+    "numpy",
+    "orjson",
+    "prometheus_client",
+    "prometheus_flask_exporter",
+)
+"""Dependencies which must only be imported when they are used."""
+
+
+def _import_times(module):
+    """Import a module in a new interpreter and get the import times.
+
+    :return: The cumulative import time in microseconds by module name.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+
+    return times
+
+
+class TestImportTime:
+    """Test that modules defer their heavy dependencies."""
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        "module",
+        [
+            "amd.util",
+            "amd.util.datetime",
+            "amd.util.dict",
+            "amd.util.error",
+            "amd.util.json",
+            "amd.util.jsonschema",
+            "amd.util.log",
+            "amd.util.object",
+            "amd.util.string",
+        ],
+    )
+    def test_budget(module):
+        """Test that a module imports no heavy dependencies and is fast."""
+        times = _import_times(module)
+        assert not set(HEAVY_MODULES).intersection(times)
+        assert times[module] < BUDGET_MICROSECONDS
+
+    @staticmethod
+    def test_flask():
+        """Test that the flask module defers metrics and validation."""
+        times = _import_times("amd.util.flask")
+        assert "flask" in times
+        assert not {
+            "jsonschema",
+            "numpy",
+            "prometheus_client",
+            "prometheus_flask_exporter",
+        }.intersection(times)
+
+    @staticmethod
+    def test_lazy_attributes():
+        """Test that lazy attributes are created on first access."""
+        import amd.util  # pylint: disable=C0415
+
+        assert "flask" in dir(amd.util)
+        assert amd.util.string.snake_to_camel("a_b") == "aB"
+        with pytest.raises(AttributeError):
+            getattr(amd.util, "missing")
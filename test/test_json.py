@@ -0,0 +1,61 @@
+"""Test functions for the json module."""
+
+from collections import deque
+from datetime import date, datetime
+
+import pytest
+import pytz
+
+from amd.util.json import dumps, loads
+
+
+class TestDumps:
+    """Test the dumps function."""
+
+    @staticmethod
+    def test_dates():
+        """Test serializing dates and naive datetimes."""
+        obj = {"a": date(2020, 1, 2), "b": datetime(2020, 1, 2, 3, 4, 5, 6)}
+        assert dumps(obj) == (
+            '{"a":"2020-01-02","b":"2020-01-02T03:04:05.000006+00:00"}'
+        )
+
+    @staticmethod
+    def test_collections():
+        """Test that sets, dict views, deques, and ranges become lists."""
+        naive = datetime(2020, 1, 2)
+        obj = {
+            "a": {"x"},
+            "b": frozenset([1]),
+            "c": {"y": 1}.keys(),
+            "d": deque([naive]),
+            "e": range(2),
+        }
+        assert dumps(obj) == (
+            '{"a":["x"],"b":[1],"c":["y"],'
+            '"d":["2020-01-02T00:00:00+00:00"],"e":[0,1]}'
+        )
+
+    @staticmethod
+    def test_iterator():
+        """Test that iterators are rejected rather than consumed."""
+        with pytest.raises(TypeError):
+            dumps({"a": (i for i in range(2))})
+
+
+class TestLoads:
+    """Test the loads function."""
+
+    @staticmethod
+    def test_dates():
+        """Test deserializing dates and datetimes with a Z offset."""
+        assert loads('{"a": "2020-01-02", "b": "2020-01-02T03:04:05Z"}') == {
+            "a": date(2020, 1, 2),
+            "b": pytz.UTC.localize(datetime(2020, 1, 2, 3, 4, 5)),
+        }
+
+    @staticmethod
+    def test_round_trip():
+        """Test that serialized datetimes are deserialized unchanged."""
+        obj = {"a": [{"b": pytz.UTC.localize(datetime(2020, 1, 2, 3))}]}
+        assert loads(dumps(obj)) == obj
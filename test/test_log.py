@@ -0,0 +1,323 @@
+"""Test functions for the log module."""
+
+import json
+import logging
+import queue
+import sys
+import time
+from datetime import datetime
+
+import pytest
+
+from amd.util.error import ExceptionCapture
+from amd.util.log import (
+    BatchingQueueListener,
+    BoundedQueueHandler,
+    BufferedRotatingFileHandler,
+    FastJsonFormatter,
+    JsonFormatter,
+    configure_production,
+    log_io,
+)
+
+
+def _make_logger(name, handler):
+    """Make a logger which only uses the handler."""
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [handler]
+
+    return logger
+
+
+class TestBoundedQueueHandler:
+    """Test the BoundedQueueHandler class."""
+
+    @staticmethod
+    def test_drop():
+        """Test that records are dropped and counted when the queue is full."""
+        handler = BoundedQueueHandler(queue.Queue(2), policy="drop")
+        logger = _make_logger("test_drop", handler)
+        for i in range(5):
+            logger.info({"i": i})
+
+        assert handler.queue.qsize() == 2
+        assert handler.dropped == 3
+
+    @staticmethod
+    def test_block_timeout():
+        """Test that records are dropped after waiting for the queue."""
+        handler = BoundedQueueHandler(
+            queue.Queue(1), policy="block", timeout=0.01
+        )
+        logger = _make_logger("test_block_timeout", handler)
+        logger.info("first")
+        logger.info("second")
+
+        assert handler.dropped == 1
+
+
+class TestBatchingQueueListener:
+    """Test the BatchingQueueListener class."""
+
+    @staticmethod
+    def test_write_json(tmp_path):
+        """Test that queued records are written as JSON lines on stop."""
+        file_path = tmp_path / "test.log"
+        file_handler = BufferedRotatingFileHandler(str(file_path))
+        file_handler.setFormatter(JsonFormatter())
+        log_queue = queue.Queue(100)
+        listener = BatchingQueueListener(log_queue, file_handler, batch_size=7)
+        logger = _make_logger("test_write_json", BoundedQueueHandler(log_queue))
+
+        listener.start()
+        for i in range(50):
+            logger.info({"i": i})
+        listener.stop()
+        listener.stop()
+        file_handler.close()
+
+        lines = file_path.read_text().splitlines()
+        assert [json.loads(i)["message"] for i in lines] == [
+            {"i": i} for i in range(50)
+        ]
+
+
+class TestConfigureProduction:
+    """Test the configure_production function."""
+
+    @staticmethod
+    def test_reconfigure(tmp_path):
+        """Test that the previous pipeline is stopped and closed."""
+        root_logger = logging.getLogger()
+        handlers = root_logger.handlers[:]
+        level = root_logger.level
+        try:
+            first = configure_production(str(tmp_path / "first.log"))
+            logging.getLogger("test_reconfigure").info("first")
+            second = configure_production(str(tmp_path / "second.log"))
+            logging.getLogger("test_reconfigure").info("second")
+
+            assert first._thread is None
+            assert first.handlers[0].stream is None
+            assert second._thread is not None
+            assert len(root_logger.handlers) == 1
+            second.stop()
+        finally:
+            for handler in root_logger.handlers[:]:
+                root_logger.removeHandler(handler)
+                handler.close()
+            root_logger.handlers = handlers
+            root_logger.setLevel(level)
+
+        for name in ("first", "second"):
+            lines = (tmp_path / ("%s.log" % name)).read_text().splitlines()
+            assert [json.loads(i)["message"] for i in lines] == [name]
+
+
+class TestFastJsonFormatter:
+    """Test the FastJsonFormatter class."""
+
+    @staticmethod
+    def _format(formatter, msg, *args, **kwargs):
+        """Format a record from a single call site."""
+        record = logging.LogRecord(
+            "test", logging.INFO, "/app/api.py", 10, msg, args, None
+        )
+        record.__dict__.update(kwargs)
+
+        return json.loads(formatter.format(record))
+
+    def test_default_fields(self):
+        """Test the default fields and message formatting."""
+        formatter = FastJsonFormatter()
+        assert self._format(formatter, {"a": 1}) == {
+            "created": pytest.approx(time.time(), abs=5),
+            "exc_info": None,
+            "file": "api.py",
+            "function": None,
+            "level": "INFO",
+            "line": 10,
+            "message": {"a": 1},
+            "module": "api",
+            "name": "test",
+            "path": "/app/api.py",
+        }
+        assert self._format(formatter, "%s%%", 100)["message"] == "100%"
+
+    def test_capture(self):
+        """Test that exceptions are captured with the configured capture."""
+        formatter = FastJsonFormatter(capture=ExceptionCapture(limit=1))
+        try:
+            raise KeyError("a")
+        except KeyError:
+            exc_info = sys.exc_info()
+
+        results = [
+            self._format(formatter, "failed", exc_info=exc_info)["exc_info"]
+            for _ in range(2)
+        ]
+        assert len(results[0]["traceback"]) == 1
+        assert results[1]["traceback"] is None
+        assert results[1]["count"] == 2
+
+    def test_context_and_extra(self):
+        """Test that context and extra fields are merged."""
+        formatter = FastJsonFormatter(
+            fields=["level", "message"], context={"service": "a%s"}
+        )
+        assert self._format(formatter, "first", user=1) == {
+            "level": "INFO",
+            "message": "first",
+            "service": "a%s",
+            "user": 1,
+        }
+        assert self._format(formatter, "second") == {
+            "level": "INFO",
+            "message": "second",
+            "service": "a%s",
+        }
+
+    def test_orjson(self):
+        """Test serializing with orjson."""
+        pytest.importorskip("orjson")
+        formatter = FastJsonFormatter(fields=["message"], use_orjson=True)
+        assert self._format(formatter, {"a": datetime(2020, 1, 2)}) == {
+            "message": {"a": "2020-01-02T00:00:00+00:00"}
+        }
+        assert self._format(formatter, {"a": {"b"}}) == {
+            "message": {"a": ["b"]}
+        }
+
+    def test_only_extra(self):
+        """Test extra fields without other fields or context."""
+        formatter = FastJsonFormatter(fields=())
+        assert self._format(formatter, "a") == {}
+        assert self._format(formatter, "a", u=1, v="b") == {"u": 1, "v": "b"}
+
+    @staticmethod
+    def test_invalid_field():
+        """Test that unknown fields are rejected."""
+        with pytest.raises(ValueError):
+            FastJsonFormatter(fields=["message", "unknown"])
+
+
+class TestBufferedRotatingFileHandler:
+    """Test the BufferedRotatingFileHandler class."""
+
+    @staticmethod
+    def test_size_rotation(tmp_path):
+        """Test that the file is rotated before it exceeds the size limit."""
+        file_path = tmp_path / "test.log"
+        handler = BufferedRotatingFileHandler(
+            str(file_path), max_bytes=100, backup_count=2
+        )
+        logger = _make_logger("test_size_rotation", handler)
+        for i in range(10):
+            logger.info("%02d" % i + "x" * 37)
+        handler.close()
+
+        assert sorted(i.name for i in tmp_path.iterdir()) == [
+            "test.log",
+            "test.log.1",
+            "test.log.2",
+        ]
+        assert file_path.read_text().splitlines()[-1].startswith("09")
+        assert all(i.stat().st_size <= 100 for i in tmp_path.iterdir())
+
+    @staticmethod
+    def test_time_rotation(tmp_path):
+        """Test that the file is rotated after the interval."""
+        file_path = tmp_path / "test.log"
+        handler = BufferedRotatingFileHandler(
+            str(file_path), backup_count=1, interval=60
+        )
+        logger = _make_logger("test_time_rotation", handler)
+        logger.info("first")
+        handler.rollover_at = 1
+        logger.info("second")
+        handler.close()
+
+        assert file_path.read_text() == "second\n"
+        assert (tmp_path / "test.log.1").read_text() == "first\n"
+
+
+class _ListHandler(logging.Handler):
+    """A handler which keeps the messages of records in a list."""
+
+    def __init__(self):
+        """See base class."""
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        """See base class."""
+        self.messages.append(record.msg)
+
+
+class TestLogIo:
+    """Test the log_io decorator."""
+
+    @staticmethod
+    def test_disabled():
+        """Test that nothing is logged when DEBUG is disabled."""
+        handler = _ListHandler()
+        logger = _make_logger("test_log_io_disabled", handler)
+        logger.setLevel(logging.INFO)
+
+        assert log_io(logger)(lambda x: x + 1)(1) == 2
+        assert not handler.messages
+
+    @staticmethod
+    def test_sample_every():
+        """Test that 1 in N calls are logged."""
+        handler = _ListHandler()
+        logger = _make_logger("test_log_io_sample", handler)
+        func = log_io(logger, sample_every=3)(lambda x: x)
+        for i in range(7):
+            func(i)
+
+        assert [
+            i["value"] for i in handler.messages if i["type"] == "output"
+        ] == [
+            0,
+            3,
+            6,
+        ]
+
+    @staticmethod
+    def test_max_length_and_timing():
+        """Test that large values are shortened and durations logged."""
+        handler = _ListHandler()
+        logger = _make_logger("test_log_io_max_length", handler)
+        func = log_io(logger, max_length=3, timing=True)(
+            lambda x, y: {"x": x, "y": y}
+        )
+        func("abcdef", y=list(range(5)))
+        inputs, outputs = handler.messages
+
+        assert inputs["value"] == {
+            "args": ["abc..."],
+            "kwargs": {"y": {"length": 5, "type": "list"}},
+        }
+        assert outputs["value"] == {
+            "x": "abc...",
+            "y": {"length": 5, "type": "list"},
+        }
+        assert outputs["duration_ns"] >= 0
+
+    @staticmethod
+    def test_exception():
+        """Test that exceptions are logged even when DEBUG is disabled."""
+        handler = _ListHandler()
+        logger = _make_logger("test_log_io_exception", handler)
+        logger.setLevel(logging.ERROR)
+
+        @log_io(logger)
+        def fail():
+            raise ValueError()
+
+        with pytest.raises(ValueError):
+            fail()
+        assert handler.messages == [{"method": "fail"}]
@@ -0,0 +1,109 @@
+"""Test functions for the object module."""
+
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from fractions import Fraction
+from uuid import UUID
+
+import pytest
+
+from amd.util.object import to_dict
+
+Point = namedtuple("Point", ["x", "y"])
+
+
+class _Color(Enum):
+    """An enum."""
+
+    RED = 1
+
+
+@dataclass
+class _Item:
+    """A dataclass."""
+
+    name: str
+    point: Point
+
+
+class _Slotted:
+    """A class with slots."""
+
+    __slots__ = ("a", "b")
+
+    def __init__(self, a):
+        self.a = a
+
+
+class _Node:
+    """A plain class."""
+
+    def __init__(self, value, children=()):
+        self.value = value
+        self.children = list(children)
+
+    def method(self):
+        """Return the value."""
+        return self.value
+
+
+class TestToDict:
+    """Test the to_dict function."""
+
+    @staticmethod
+    def test_objects():
+        """Test that objects are converted recursively."""
+        at = datetime(2020, 1, 2)
+        node = _Node(_Item("a", Point(1, 2)), [_Node(_Slotted(at))])
+        assert to_dict(node) == {
+            "value": {"name": "a", "point": {"x": 1, "y": 2}},
+            "children": [{"value": {"a": at}, "children": []}],
+        }
+
+    @staticmethod
+    def test_collections():
+        """Test that collections are converted and scalars are kept."""
+        result = to_dict({1: (1, "a"), "b": {2, 3}, "c": b"x"})
+        assert result[1] == [1, "a"]
+        assert sorted(result["b"]) == [2, 3]
+        assert result["c"] == b"x"
+        assert to_dict(i for i in range(3)) == [0, 1, 2]
+
+    @staticmethod
+    def test_scalars():
+        """Test that numbers, enums, and UUIDs are returned as is."""
+        uuid = UUID(int=1)
+        assert to_dict(Decimal("1.5")) == Decimal("1.5")
+        assert to_dict(
+            {"price": Decimal("2"), "ratio": Fraction(1, 3), "id": uuid}
+        ) == {"price": Decimal("2"), "ratio": Fraction(1, 3), "id": uuid}
+        assert to_dict([_Color.RED]) == [_Color.RED]
+
+    @staticmethod
+    def test_attrs():
+        """Test that attrs classes are converted."""
+        attr = pytest.importorskip("attr")
+
+        @attr.s
+        class Pair:
+            left = attr.ib()
+            right = attr.ib()
+
+        assert to_dict(Pair(1, Point(2, 3))) == {
+            "left": 1,
+            "right": {"x": 2, "y": 3},
+        }
+
+    @staticmethod
+    def test_cycle():
+        """Test that circular references are detected."""
+        node = _Node(1)
+        node.children.append(node)
+        with pytest.raises(ValueError):
+            to_dict(node)
+
+        shared = [1]
+        assert to_dict([shared, shared]) == [[1], [1]]
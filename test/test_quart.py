@@ -0,0 +1,116 @@
+"""Test functions for the quart module."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+import pytz
+
+pytest.importorskip("quart")
+
+# pylint: disable=C0413
+from quart import Quart  # noqa: E402
+
+from amd.util.quart import (  # noqa: E402
+    OFFLOAD,
+    configure_offload,
+    load_body,
+    load_querystring,
+    make_json_response,
+    register_error_handlers,
+    validate,
+)
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "request_body": {
+            "type": "object",
+            "properties": {"at": {"type": "datetime"}},
+            "required": ["at"],
+        }
+    },
+}
+
+
+def _make_app():
+    """Make an app with routes that use the request helpers."""
+    app = Quart(__name__)
+    register_error_handlers(app)
+
+    @app.route("/items", methods=["POST"])
+    @validate(SCHEMA)
+    async def post_items():
+        body = await load_body()
+        assert body["at"] == datetime(2020, 1, 2, tzinfo=pytz.UTC)
+        return await make_json_response(body)
+
+    @app.route("/items", methods=["GET"])
+    async def get_items():
+        return await make_json_response(load_querystring())
+
+    return app
+
+
+def _request(method, path, **kwargs):
+    """Send a request to a new app and return the status and JSON body."""
+
+    async def send():
+        client = _make_app().test_client()
+        response = await getattr(client, method)(path, **kwargs)
+        body = await response.get_data()
+        return response.status_code, body
+
+    return asyncio.run(send())
+
+
+class TestQuart:
+    """Test the Quart request and response helpers."""
+
+    @staticmethod
+    def test_post():
+        """Test that a valid body is validated, loaded, and sent back."""
+        status, body = _request(
+            "post", "/items", data='{"at": "2020-01-02T00:00:00Z"}'
+        )
+        assert status == 200
+        assert b'"at": "2020-01-02T00:00:00+00:00"' in body
+
+    @staticmethod
+    def test_offload():
+        """Test that large payloads are handled by the executor."""
+        with ThreadPoolExecutor(1) as executor:
+            configure_offload(executor, min_bytes=0, min_items=0)
+            try:
+                status, _ = _request(
+                    "post", "/items", data='{"at": "2020-01-02T00:00:00Z"}'
+                )
+            finally:
+                configure_offload()
+        assert status == 200
+        assert OFFLOAD["executor"] is None
+
+    @staticmethod
+    def test_invalid():
+        """Test that an invalid body returns JSON:API errors."""
+        status, body = _request("post", "/items", data="{}")
+        assert status == 400
+        assert b"'at' is a required property" in body
+
+    @staticmethod
+    def test_querystring():
+        """Test that query parameters are parsed."""
+        status, body = _request(
+            "get", "/items", query_string={"limit": "2", "sort": "a,-b"}
+        )
+        assert status == 200
+        assert b'"limit": 2' in body
+        assert b'"-b"' in body
+
+    @staticmethod
+    def test_not_found():
+        """Test that unknown routes return an empty JSON response."""
+        status, body = _request("get", "/missing")
+        assert status == 404
+        assert body == b""
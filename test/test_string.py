@@ -1,6 +1,12 @@
 """Test functions for the str module."""
 
-from amd.util.string import camel_to_snake, snake_to_camel
+from amd.util.string import (
+    camel_to_snake,
+    convert_keys,
+    keys_to_camel,
+    keys_to_snake,
+    snake_to_camel,
+)
 
 
 class TestCamelToSnake:
@@ -17,6 +23,34 @@ class TestCamelToSnake:
         assert camel_to_snake("testCamelString") == "test_camel_string"
 
 
+class TestConvertKeys:
+    """Test the convert_keys functions."""
+
+    @staticmethod
+    def test_copy():
+        """Test converting nested keys without modifying the input."""
+        obj = {"itemList": [{"itemId": 1, 2: "two"}, "itemId"], "itemId": 3}
+        assert keys_to_snake(obj) == {
+            "item_list": [{"item_id": 1, 2: "two"}, "itemId"],
+            "item_id": 3,
+        }
+        assert "itemList" in obj
+
+    @staticmethod
+    def test_inplace():
+        """Test converting nested keys in place."""
+        inner = {"item_id": 1}
+        obj = [{"item_list": [inner]}]
+        assert keys_to_camel(obj, inplace=True) is obj
+        assert obj == [{"itemList": [{"itemId": 1}]}]
+        assert obj[0]["itemList"][0] is inner
+
+    @staticmethod
+    def test_custom():
+        """Test converting keys with a custom function."""
+        assert convert_keys({"a": {"b": 1}}, str.upper) == {"A": {"B": 1}}
+
+
 class TestSnakeToCamel:
     """Test the snake_to_camel function."""
 